@@ -1,11 +1,17 @@
 # acl.py
+import asyncio
+import hashlib
+import hmac
 import sqlite3
 import os
 import json
+import re
 from datetime import datetime
-from typing import Optional, Dict, Any, List
-from cryptography.fernet import Fernet
+from typing import Optional, Dict, Any, List, Tuple
+import aiosqlite
+from cryptography.fernet import Fernet, MultiFernet
 from dotenv import load_dotenv
+from core.audit_archive import AUDIT_ARCHIVE
 
 # --------------------------------------------------------------------
 # Load environment variables
@@ -29,6 +35,55 @@ def _prepare_key(key_str: str) -> bytes:
 
 fernet = Fernet(_prepare_key(DB_ENCRYPTION_KEY))
 
+# Key rotation: every row records the version of the key that encrypted it.
+# DB_ENCRYPTION_KEY is the primary (write) key; retired keys stay readable via
+# DB_ENCRYPTION_PREVIOUS_KEYS="1:<key>,2:<key>" until the ledger has been
+# re-encrypted (see core/key_rotation.py).
+PRIMARY_KEY_VERSION = int(os.getenv("DB_ENCRYPTION_KEY_VERSION", "1"))
+
+
+def _parse_previous_keys(value: str) -> Dict[int, str]:
+    keys = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        version, sep, key = item.partition(":")
+        if not sep or not version.strip().isdigit():
+            raise ValueError("DB_ENCRYPTION_PREVIOUS_KEYS must look like '1:<key>,2:<key>'.")
+        keys[int(version)] = key.strip()
+    if PRIMARY_KEY_VERSION in keys:
+        raise ValueError(f"DB_ENCRYPTION_PREVIOUS_KEYS reuses the primary key version {PRIMARY_KEY_VERSION}.")
+    return keys
+
+
+_previous_keys = _parse_previous_keys(os.getenv("DB_ENCRYPTION_PREVIOUS_KEYS", ""))
+KEYRING: Dict[int, Fernet] = {PRIMARY_KEY_VERSION: fernet}
+KEYRING.update({version: Fernet(_prepare_key(key)) for version, key in _previous_keys.items()})
+# Fallback for rows without a (known) key version: tries the primary key first.
+_multi_fernet = MultiFernet([fernet] + [KEYRING[v] for v in sorted(_previous_keys, reverse=True)])
+
+# Blind index: keyed HMAC tokens of selected payload fields, stored in plaintext
+# columns so equality searches don't have to decrypt the whole ledger. Without
+# AUDIT_INDEX_KEY a separate key is derived from the oldest configured DB key,
+# so rotating the encryption key does not change existing index tokens.
+# AUDIT_INDEX_KEY is used as-is, or as raw bytes when given as "hex:<hex>"
+# (the form printed by scripts/rotate_audit_key.py --show-index-key).
+AUDIT_INDEX_KEY = os.getenv("AUDIT_INDEX_KEY")
+_oldest_key = DB_ENCRYPTION_KEY if not _previous_keys else _previous_keys[min(_previous_keys)]
+
+
+def _parse_index_key(value: str) -> bytes:
+    if value.startswith("hex:"):
+        return bytes.fromhex(value[4:])
+    return value.encode()
+
+
+_index_key = (
+    _parse_index_key(AUDIT_INDEX_KEY) if AUDIT_INDEX_KEY
+    else hmac.new(_oldest_key.encode(), b"audit-blind-index", hashlib.sha256).digest()
+)
+AUDIT_INDEXED_FIELDS = tuple(
+    f.strip() for f in os.getenv("AUDIT_INDEXED_FIELDS", "user_sub,delegated_action").split(",") if f.strip()
+)
+
 
 # --------------------------------------------------------------------
 # Helpers
@@ -41,13 +96,45 @@ def _ensure_db_dir() -> None:
 
 
 def encrypt_payload(payload: str) -> str:
-    """Encrypt a string payload before writing to DB."""
+    """Encrypt a string payload before writing to DB (always with the primary key)."""
     return fernet.encrypt(payload.encode()).decode()
 
 
-def decrypt_payload(encrypted: str) -> str:
-    """Decrypt a string payload after reading from DB."""
-    return fernet.decrypt(encrypted.encode()).decode()
+def decrypt_payload(encrypted: str, key_version: Optional[int] = None) -> str:
+    """Decrypt a string payload after reading from DB, using the key it was written with."""
+    key = KEYRING.get(key_version) if key_version is not None else None
+    if key is None:
+        return _multi_fernet.decrypt(encrypted.encode()).decode()
+    return key.decrypt(encrypted.encode()).decode()
+
+
+def blind_index_token(field: str, value: Any) -> str:
+    """Keyed HMAC token for an indexed field value (the field name is part of the MAC)."""
+    return hmac.new(_index_key, f"{field}\x00{value}".encode(), hashlib.sha256).hexdigest()
+
+
+def _index_tokens(payload: Dict[str, Any]) -> List[Tuple[str, str]]:
+    tokens = []
+    for field in AUDIT_INDEXED_FIELDS:
+        value = payload.get(field) if isinstance(payload, dict) else None
+        if isinstance(value, (str, int, float, bool)):
+            tokens.append((field, blind_index_token(field, value)))
+    return tokens
+
+
+_EVENT_COLUMNS = "id, timestamp, event_type, payload, key_version"
+
+
+def _row_to_event(row) -> Dict[str, Any]:
+    """(id, timestamp, event_type, payload, key_version) row -> event dict with decrypted payload."""
+    if row[3]:
+        try:
+            payload = json.loads(decrypt_payload(row[3], row[4]))
+        except Exception:
+            payload = {"raw": row[3]}
+    else:
+        payload = None
+    return {"id": row[0], "timestamp": row[1], "event_type": row[2], "payload": payload}
 
 
 # --------------------------------------------------------------------
@@ -59,73 +146,270 @@ def init_db() -> None:
     conn = sqlite3.connect(DB_PATH)
     try:
         c = conn.cursor()
+        # WAL lets the async writer and synchronous readers work concurrently.
+        c.execute("PRAGMA journal_mode=WAL")
         c.execute(
             """
             CREATE TABLE IF NOT EXISTS audit (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT NOT NULL,
                 event_type TEXT NOT NULL,
-                payload TEXT
+                payload TEXT,
+                key_version INTEGER
             )
             """
         )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_index (
+                event_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                token TEXT NOT NULL
+            )
+            """
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_audit_index_lookup ON audit_index (field, token, event_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_audit_index_event ON audit_index (event_id)")
+        # Plaintext-safe counters for dashboards (see _stats_key); maintained on every write.
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_stats (
+                hour TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                user_token TEXT NOT NULL,
+                action TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (hour, event_type, user_token, action, reason)
+            ) WITHOUT ROWID
+            """
+        )
+        # Token counts of LLM calls (LLM_USAGE_EVENT), per hour and role set; maintained like audit_stats.
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                hour TEXT NOT NULL,
+                roles TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                cached_input_tokens INTEGER NOT NULL,
+                PRIMARY KEY (hour, roles)
+            ) WITHOUT ROWID
+            """
+        )
+        # Ledgers created before key versioning: NULL means "try every key".
+        columns = [col[1] for col in c.execute("PRAGMA table_info(audit)")]
+        if "key_version" not in columns:
+            c.execute("ALTER TABLE audit ADD COLUMN key_version INTEGER")
         conn.commit()
     finally:
         conn.close()
 
 
+def _serialize_payload(payload: Dict[str, Any]) -> str:
+    """JSON-encode and encrypt an event payload for storage."""
+    try:
+        payload_json = json.dumps(payload, default=str, ensure_ascii=False)
+    except Exception:
+        payload_json = json.dumps({"__repr__": repr(payload)})
+    return encrypt_payload(payload_json)
+
+
+# Placeholder in follow-up statement parameters, replaced by the new audit row ID.
+_EVENT_ID = object()
+
+_INSERT_AUDIT = "INSERT INTO audit (timestamp, event_type, payload, key_version) VALUES (?, ?, ?, ?)"
+_INSERT_INDEX = "INSERT INTO audit_index (event_id, field, token) VALUES (?, ?, ?)"
+_UPSERT_STATS = (
+    "INSERT INTO audit_stats (hour, event_type, user_token, action, reason, count) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (hour, event_type, user_token, action, reason) DO UPDATE SET count = count + excluded.count"
+)
+
+# One event per intent-parsing LLM call; its token counts are also summed into llm_usage.
+LLM_USAGE_EVENT = "llm_intent_call"
+LLM_USAGE_FIELDS = ("input_tokens", "output_tokens", "cached_input_tokens")
+_UPSERT_LLM_USAGE = (
+    "INSERT INTO llm_usage (hour, roles, requests, input_tokens, output_tokens, cached_input_tokens) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (hour, roles) DO UPDATE SET "
+    "requests = requests + excluded.requests, input_tokens = input_tokens + excluded.input_tokens, "
+    "output_tokens = output_tokens + excluded.output_tokens, "
+    "cached_input_tokens = cached_input_tokens + excluded.cached_input_tokens"
+)
+
+STATS_DIMENSIONS = ("hour", "event_type", "user", "action", "reason")
+_STATS_COLUMNS = {"hour": "hour", "event_type": "event_type", "user": "user_token", "action": "action", "reason": "reason"}
+# Quoted values and numbers are stripped from reasons so only the reason's template is stored in plaintext.
+_QUOTED_RE = re.compile(r"'[^']*'|\"[^\"]*\"")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _stats_key(event_type: str, payload: Dict[str, Any], timestamp: str) -> tuple:
+    """(hour, event_type, user_token, action, reason) counter key; no raw payload values."""
+    payload = payload if isinstance(payload, dict) else {}
+    user = payload.get("user_sub")
+    reason = payload.get("reason")
+    reason = _NUMBER_RE.sub("N", _QUOTED_RE.sub("'...'", reason))[:120] if isinstance(reason, str) else ""
+    action = payload.get("delegated_action")
+    return (
+        timestamp[:13],
+        event_type,
+        blind_index_token("user_sub", user)[:16] if user is not None else "",
+        # Delegated actions are limited to ROLE_ACTION_MAP keys by /auth/delegate.
+        action[:64] if isinstance(action, str) else "",
+        reason,
+    )
+
+
+def _llm_usage_row(payload: Dict[str, Any], timestamp: str) -> tuple:
+    """(hour, roles, requests, input, output, cached input) increments for an LLM_USAGE_EVENT."""
+    payload = payload if isinstance(payload, dict) else {}
+    roles = payload.get("roles")
+    counts = [payload.get(field) for field in LLM_USAGE_FIELDS]
+    return (timestamp[:13], ",".join(roles) if isinstance(roles, list) else "", 1,
+            *(count if isinstance(count, int) else 0 for count in counts))
+
+
+PreparedEvent = Tuple[tuple, List[Tuple[str, tuple]]]
+
+
+def _prepare_event(event_type: str, payload: Dict[str, Any], timestamp: str) -> PreparedEvent:
+    """
+    Does all CPU work for an event up front (serialization, encryption) and
+    returns the audit row plus any follow-up statements to run after it in the
+    same transaction. Shared by the sync and async write paths.
+    """
+    followups = [(_INSERT_INDEX, (_EVENT_ID, field, token)) for field, token in _index_tokens(payload)]
+    followups.append((_UPSERT_STATS, (*_stats_key(event_type, payload, timestamp), 1)))
+    if event_type == LLM_USAGE_EVENT:
+        followups.append((_UPSERT_LLM_USAGE, _llm_usage_row(payload, timestamp)))
+    return (timestamp, event_type, _serialize_payload(payload), PRIMARY_KEY_VERSION), followups
+
+
+def _bind(params: tuple, event_id: int) -> tuple:
+    return tuple(event_id if p is _EVENT_ID else p for p in params)
+
+
+def _write_events(conn: sqlite3.Connection, prepared: List[PreparedEvent]) -> List[int]:
+    c = conn.cursor()
+    event_ids = []
+    for row, followups in prepared:
+        c.execute(_INSERT_AUDIT, row)
+        event_id = c.lastrowid
+        for sql, params in followups:
+            c.execute(sql, _bind(params, event_id))
+        event_ids.append(event_id)
+    return event_ids
+
+
 def log_event(event_type: str, payload: Dict[str, Any]) -> int:
     """
     Insert an event into the audit ledger (payload is encrypted).
     Returns the inserted row ID.
     """
-    _ensure_db_dir()
-    try:
-        payload_json = json.dumps(payload, default=str, ensure_ascii=False)
-    except Exception:
-        payload_json = json.dumps({"__repr__": repr(payload)})
+    return log_events([(event_type, payload)])[0]
 
-    encrypted_payload = encrypt_payload(payload_json)
+
+def log_events(events: List[Tuple[str, Dict[str, Any]]]) -> List[int]:
+    """
+    Insert several (event_type, payload) events in a single transaction.
+    Either all events are written or none are. Returns the row IDs in order.
+    """
+    _ensure_db_dir()
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    prepared = [_prepare_event(event_type, payload, timestamp) for event_type, payload in events]
 
     conn = sqlite3.connect(DB_PATH)
     try:
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO audit (timestamp, event_type, payload) VALUES (?, ?, ?)",
-            (datetime.utcnow().isoformat() + "Z", event_type, encrypted_payload),
-        )
+        event_ids = _write_events(conn, prepared)
         conn.commit()
-        return c.lastrowid
+        return event_ids
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
 
+# --------------------------------------------------------------------
+# Async write path (aiosqlite)
+# --------------------------------------------------------------------
+# The async handlers share one aiosqlite connection; SQLite serializes writers
+# anyway, and the lock keeps concurrent transactions from interleaving on it.
+_async_conn: Optional[aiosqlite.Connection] = None
+_async_lock: Optional[asyncio.Lock] = None
+
+
+async def _get_async_conn() -> aiosqlite.Connection:
+    """Opens the shared connection once, even if the first writers arrive concurrently."""
+    global _async_conn, _async_lock
+    if _async_lock is None:
+        # No await between the check and the assignment, so only one lock is ever created.
+        _async_lock = asyncio.Lock()
+    if _async_conn is None:
+        async with _async_lock:
+            if _async_conn is None:
+                _ensure_db_dir()
+                _async_conn = await aiosqlite.connect(DB_PATH)
+    return _async_conn
+
+
+async def open_async_db() -> None:
+    """Opens the shared async connection up front (called on application startup)."""
+    await _get_async_conn()
+
+
+async def close_async_db() -> None:
+    """Close the shared async connection (called on application shutdown)."""
+    global _async_conn, _async_lock
+    if _async_conn is not None:
+        await _async_conn.close()
+    _async_conn = None
+    _async_lock = None
+
+
+async def log_events_async(events: List[Tuple[str, Dict[str, Any]]]) -> List[int]:
+    """Non-blocking log_events: encryption runs inline, SQLite I/O on aiosqlite's thread."""
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    prepared = [_prepare_event(event_type, payload, timestamp) for event_type, payload in events]
+
+    conn = await _get_async_conn()
+    async with _async_lock:
+        try:
+            event_ids = []
+            for row, followups in prepared:
+                cursor = await conn.execute(_INSERT_AUDIT, row)
+                event_id = cursor.lastrowid
+                for sql, params in followups:
+                    await conn.execute(sql, _bind(params, event_id))
+                event_ids.append(event_id)
+            await conn.commit()
+            return event_ids
+        except Exception:
+            await conn.rollback()
+            raise
+
+
+async def log_event_async(event_type: str, payload: Dict[str, Any]) -> int:
+    return (await log_events_async([(event_type, payload)]))[0]
+
+
 def get_event(event_id: int) -> Optional[Dict[str, Any]]:
     """
     Retrieve a single event by ID. Decrypts payload.
+    Events moved out by the retention job are read from the archive segments.
     Returns None if not found.
     """
     conn = sqlite3.connect(DB_PATH)
     try:
         c = conn.cursor()
-        c.execute("SELECT id, timestamp, event_type, payload FROM audit WHERE id = ?", (event_id,))
+        c.execute(f"SELECT {_EVENT_COLUMNS} FROM audit WHERE id = ?", (event_id,))
         row = c.fetchone()
-        if not row:
-            return None
-
-        decrypted = None
-        if row[3]:
-            try:
-                decrypted = decrypt_payload(row[3])
-                payload = json.loads(decrypted)
-            except Exception:
-                payload = {"raw": row[3]}
-        else:
-            payload = None
-
-        return {"id": row[0], "timestamp": row[1], "event_type": row[2], "payload": payload}
     finally:
         conn.close()
+    if not row:
+        row = AUDIT_ARCHIVE.read(event_id)
+    return _row_to_event(row) if row else None
 
 
 def get_recent_events(limit: int = 50) -> List[Dict[str, Any]]:
@@ -136,17 +420,189 @@ def get_recent_events(limit: int = 50) -> List[Dict[str, Any]]:
     conn = sqlite3.connect(DB_PATH)
     try:
         c = conn.cursor()
-        c.execute("SELECT id, timestamp, event_type, payload FROM audit ORDER BY id DESC LIMIT ?", (limit,))
-        rows = c.fetchall()
-        out = []
-        for r in rows:
-            try:
-                decrypted = decrypt_payload(r[3]) if r[3] else None
-                payload = json.loads(decrypted) if decrypted else None
-            except Exception:
-                payload = {"raw": r[3]}
-            out.append({"id": r[0], "timestamp": r[1], "event_type": r[2], "payload": payload})
-        return out
+        c.execute(f"SELECT {_EVENT_COLUMNS} FROM audit ORDER BY id DESC LIMIT ?", (limit,))
+        return [_row_to_event(r) for r in c.fetchall()]
+    finally:
+        conn.close()
+
+
+def find_events(filters: Dict[str, Any], event_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Equality search over indexed payload fields, newest first. Each filter is
+    turned into a blind-index lookup and only the matching rows are decrypted.
+    Raises ValueError for fields that are not in AUDIT_INDEXED_FIELDS.
+    """
+    unknown = [field for field in filters if field not in AUDIT_INDEXED_FIELDS]
+    if unknown:
+        raise ValueError(f"Field(s) not indexed: {', '.join(unknown)}. Indexed fields: {', '.join(AUDIT_INDEXED_FIELDS)}.")
+
+    clauses, params = [], []
+    for field, value in filters.items():
+        clauses.append("id IN (SELECT event_id FROM audit_index WHERE field = ? AND token = ?)")
+        params += [field, blind_index_token(field, value)]
+    if event_type is not None:
+        clauses.append("event_type = ?")
+        params.append(event_type)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT {_EVENT_COLUMNS} FROM audit {where} ORDER BY id DESC LIMIT ?", (*params, limit))
+        return [_row_to_event(r) for r in c.fetchall()]
+    finally:
+        conn.close()
+
+
+def rebuild_blind_index(batch_size: int = 500) -> int:
+    """
+    Recomputes audit_index for every event in the hot audit table, e.g. after
+    changing AUDIT_INDEXED_FIELDS or AUDIT_INDEX_KEY. Archived events are not
+    searchable, so they get no index rows. Returns the number of events scanned.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        c = conn.cursor()
+        c.execute("DELETE FROM audit_index")
+        scanned, last_id = 0, 0
+        while True:
+            c.execute(f"SELECT {_EVENT_COLUMNS} FROM audit WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            rows = c.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                payload = _row_to_event(row)["payload"]
+                c.executemany(_INSERT_INDEX, [(row[0], f, t) for f, t in _index_tokens(payload or {})])
+            scanned += len(rows)
+            last_id = rows[-1][0]
+        conn.commit()
+        return scanned
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def get_stats(group_by: List[str], since: Optional[str] = None, until: Optional[str] = None,
+              event_type: Optional[str] = None, user_sub: Optional[str] = None,
+              limit: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Event counts from the audit_stats aggregates, grouped by any of
+    STATS_DIMENSIONS. `since`/`until` are ISO hour prefixes (e.g.
+    "2025-01-31T09"), both inclusive. Never reads the encrypted payloads.
+    """
+    unknown = [dim for dim in group_by if dim not in STATS_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension(s): {', '.join(unknown)}. Use: {', '.join(STATS_DIMENSIONS)}.")
+
+    clauses, params = [], []
+    if since:
+        clauses.append("hour >= ?")
+        params.append(since[:13])
+    if until:
+        clauses.append("hour <= ?")
+        params.append(until[:13])
+    if event_type:
+        clauses.append("event_type = ?")
+        params.append(event_type)
+    if user_sub:
+        clauses.append("user_token = ?")
+        params.append(blind_index_token("user_sub", user_sub)[:16])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    columns = [_STATS_COLUMNS[dim] for dim in group_by]
+    select = ", ".join(columns + ["SUM(count)"])
+    group = f"GROUP BY {', '.join(columns)}" if columns else ""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            f"SELECT {select} FROM audit_stats {where} {group} ORDER BY SUM(count) DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{**dict(zip(group_by, row[:-1])), "count": row[-1]} for row in rows if row[-1]]
+
+
+def get_llm_usage(since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Token counts of intent-parsing LLM calls from the llm_usage aggregates, in
+    total and per role set. `since`/`until` are ISO hour prefixes, both inclusive.
+    """
+    clauses, params = [], []
+    if since:
+        clauses.append("hour >= ?")
+        params.append(since[:13])
+    if until:
+        clauses.append("hour <= ?")
+        params.append(until[:13])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    fields = ("requests",) + LLM_USAGE_FIELDS
+    sums = ", ".join(f"SUM({field})" for field in fields)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            f"SELECT roles, {sums} FROM llm_usage {where} GROUP BY roles ORDER BY SUM(requests) DESC", params
+        ).fetchall()
+    finally:
+        conn.close()
+
+    by_roles = [{"roles": row[0].split(",") if row[0] else [], **dict(zip(fields, row[1:]))} for row in rows]
+    totals = {field: sum(entry[field] for entry in by_roles) for field in fields}
+    requests = totals["requests"] or 1
+    totals["mean_input_tokens"] = round(totals["input_tokens"] / requests, 1)
+    totals["mean_output_tokens"] = round(totals["output_tokens"] / requests, 1)
+    return {"totals": totals, "by_role_set": by_roles}
+
+
+def rebuild_audit_stats(batch_size: int = 500) -> int:
+    """
+    Recomputes audit_stats and llm_usage from the whole ledger, archived events
+    included (backfill for events written before they existed). Returns the
+    number of events counted.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        c = conn.cursor()
+        c.execute("DELETE FROM audit_stats")
+        c.execute("DELETE FROM llm_usage")
+        scanned = 0
+
+        def count(rows) -> None:
+            stats, usage = [], []
+            for row in rows:
+                payload = _row_to_event(row)["payload"]
+                stats.append((*_stats_key(row[2], payload, row[1]), 1))
+                if row[2] == LLM_USAGE_EVENT:
+                    usage.append(_llm_usage_row(payload, row[1]))
+            c.executemany(_UPSERT_STATS, stats)
+            c.executemany(_UPSERT_LLM_USAGE, usage)
+
+        batch = []
+        for row in AUDIT_ARCHIVE.iter_rows():
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count(batch)
+                scanned += len(batch)
+                batch = []
+        count(batch)
+        scanned += len(batch)
+        # Hot rows left behind by an interrupted archiving run were counted from the archive.
+        last_id = AUDIT_ARCHIVE.last_archived_id()
+        while True:
+            c.execute(f"SELECT {_EVENT_COLUMNS} FROM audit WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            rows = c.fetchall()
+            if not rows:
+                break
+            count(rows)
+            scanned += len(rows)
+            last_id = rows[-1][0]
+        conn.commit()
+        return scanned
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
@@ -155,8 +611,14 @@ def get_recent_events(limit: int = 50) -> List[Dict[str, Any]]:
 # CLI Debug Mode
 # --------------------------------------------------------------------
 if __name__ == "__main__":
+    import sys
+
     init_db()
     print("Initialized ACL DB at", DB_PATH)
+    if "--rebuild-index" in sys.argv:
+        print(f"Rebuilt blind index for {rebuild_blind_index()} events ({', '.join(AUDIT_INDEXED_FIELDS)}).")
+    if "--rebuild-stats" in sys.argv:
+        print(f"Rebuilt audit_stats and llm_usage from {rebuild_audit_stats()} events.")
     print("Recent 10 events:")
     for ev in get_recent_events(10):
         print(ev)
@@ -0,0 +1,231 @@
+# admission.py
+# Admission control and load shedding for LLM-backed endpoints (/auth/intent).
+#
+# Every request passes three checks before it may call the LLM:
+#   1. a token bucket per user (INTENT_USER_RATE / INTENT_USER_BURST),
+#   2. a token bucket per role, shared by all users of that role
+#      (INTENT_ROLE_RATES="teller:20,advisor:20"; unset roles are unlimited).
+#      A user with several limited roles takes a token from each of them.
+#      The highest-priority role only decides the place in the gate queue.
+#   3. a priority gate capping concurrent LLM calls (LLM_MAX_CONCURRENCY).
+#      Waiting requests are served by role priority (INTENT_ROLE_PRIORITIES,
+#      lower first) and then FIFO. A request whose estimated wait exceeds
+#      INTENT_QUEUE_BUDGET_SECONDS is shed right away instead of queueing.
+# Rate-limited requests get 429 and shed ones 503, both with Retry-After.
+#
+# All state is only touched from the event loop thread, so no locks are
+# needed. A bucket is a two-slot list [tokens, last_refill] in a dict, and idle
+# buckets are pruned once they would be full again anyway.
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+def _parse_role_map(value: str) -> Dict[str, float]:
+    roles = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        role, _, number = item.partition(":")
+        roles[role.strip()] = float(number)
+    return roles
+
+
+INTENT_USER_RATE = float(os.getenv("INTENT_USER_RATE", "1"))
+INTENT_USER_BURST = float(os.getenv("INTENT_USER_BURST", "5"))
+INTENT_ROLE_RATES = _parse_role_map(os.getenv("INTENT_ROLE_RATES", ""))
+INTENT_ROLE_PRIORITIES = _parse_role_map(
+    os.getenv("INTENT_ROLE_PRIORITIES", "manager:0,transaction_override:0,advisor:1,audit_reader:1,teller:2,customer_service:2")
+)
+INTENT_DEFAULT_PRIORITY = float(os.getenv("INTENT_DEFAULT_PRIORITY", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+INTENT_QUEUE_BUDGET_SECONDS = float(os.getenv("INTENT_QUEUE_BUDGET_SECONDS", "5"))
+# Starting guess for the LLM call duration, refined by an EWMA of real calls.
+LLM_INITIAL_SERVICE_SECONDS = float(os.getenv("LLM_INITIAL_SERVICE_SECONDS", "1"))
+
+
+class AdmissionRejected(Exception):
+    """Request refused by admission control; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucketLimiter:
+    """Keyed token buckets refilling at `rate` tokens/s up to `burst`."""
+    __slots__ = ("rate", "burst", "_buckets", "_next_prune")
+
+    def __init__(self, rate: float, burst: float):
+        # A zero rate would never refill (and divide by zero when computing Retry-After).
+        if not rate > 0:
+            raise ValueError(f"Token bucket rate must be > 0 tokens/s, got {rate}.")
+        if not burst >= 1:
+            raise ValueError(f"Token bucket burst must be >= 1, got {burst}.")
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, List[float]] = {}
+        self._next_prune = 0.0
+
+    def try_acquire(self, key: str, now: float) -> float:
+        """Takes one token. Returns 0.0 on success, else the seconds until a token is available."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if now >= self._next_prune:
+                self._prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        return (1.0 - tokens) / self.rate
+
+    def refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + 1.0)
+
+    def _prune(self, now: float) -> None:
+        # A bucket idle for burst/rate seconds is full again; dropping it is lossless.
+        refill_time = self.burst / self.rate
+        self._buckets = {k: b for k, b in self._buckets.items() if now - b[1] < refill_time}
+        self._next_prune = now + refill_time
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class PriorityGate:
+    """
+    Concurrency limiter whose waiters are woken by (priority, arrival) order.
+    Keeps an EWMA of slot hold times to estimate queueing delay.
+    """
+
+    def __init__(self, max_concurrency: int, budget_seconds: float,
+                 initial_service_seconds: float = LLM_INITIAL_SERVICE_SECONDS, alpha: float = 0.2):
+        self.max_concurrency = max_concurrency
+        self.budget_seconds = budget_seconds
+        self.alpha = alpha
+        self.service_seconds = initial_service_seconds
+        self.active = 0
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._waiting: Dict[float, int] = {}
+        self._seq = itertools.count()
+
+    def estimated_wait(self, priority: float) -> float:
+        if self.active < self.max_concurrency and not self._waiters:
+            return 0.0
+        ahead = sum(count for p, count in self._waiting.items() if p <= priority)
+        return (ahead + 1) * self.service_seconds / self.max_concurrency
+
+    async def acquire(self, priority: float) -> None:
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        wait = self.estimated_wait(priority)
+        if wait > self.budget_seconds:
+            raise AdmissionRejected(503, "Server is busy, please retry later.", wait)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            await asyncio.wait_for(future, timeout=self.budget_seconds)
+        except asyncio.TimeoutError:
+            if not (future.done() and not future.cancelled()):
+                raise AdmissionRejected(503, "Server is busy, please retry later.", self.estimated_wait(priority))
+        except BaseException:
+            # Cancelled (client went away) after a slot was already handed over: give it back.
+            if future.done() and not future.cancelled():
+                self.release(None)
+            raise
+        finally:
+            self._waiting[priority] -= 1
+            if not self._waiting[priority]:
+                del self._waiting[priority]
+
+    def release(self, held_seconds: Optional[float]) -> None:
+        if held_seconds is not None:
+            self.service_seconds += self.alpha * (held_seconds - self.service_seconds)
+        # Hand the slot straight to the next live waiter, skipping timed-out ones.
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "waiting": sum(self._waiting.values()),
+            "max_concurrency": self.max_concurrency,
+            "service_seconds_ewma": round(self.service_seconds, 4),
+        }
+
+
+class AdmissionController:
+    def __init__(self, user_rate: float = INTENT_USER_RATE, user_burst: float = INTENT_USER_BURST,
+                 role_rates: Optional[Dict[str, float]] = None, role_priorities: Optional[Dict[str, float]] = None,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, budget_seconds: float = INTENT_QUEUE_BUDGET_SECONDS):
+        self.user_limiter = TokenBucketLimiter(user_rate, user_burst)
+        role_rates = INTENT_ROLE_RATES if role_rates is None else role_rates
+        self.role_limiters = {role: TokenBucketLimiter(rate, max(1.0, 2 * rate)) for role, rate in role_rates.items()}
+        self.role_priorities = INTENT_ROLE_PRIORITIES if role_priorities is None else role_priorities
+        self.gate = PriorityGate(max_concurrency, budget_seconds)
+
+    def _primary_role(self, roles: List[str]) -> Tuple[Optional[str], float]:
+        """The caller's highest-priority role and its priority (used for the gate only)."""
+        ranked = [(self.role_priorities.get(r, INTENT_DEFAULT_PRIORITY), r) for r in roles]
+        if not ranked:
+            return None, INTENT_DEFAULT_PRIORITY
+        priority, role = min(ranked)
+        return role, priority
+
+    @asynccontextmanager
+    async def admit(self, user: str, roles: List[str]):
+        """Holds one LLM slot for the duration of the block, or raises AdmissionRejected."""
+        _, priority = self._primary_role(roles)
+        now = time.monotonic()
+
+        wait = self.user_limiter.try_acquire(user, now)
+        if wait:
+            raise AdmissionRejected(429, "Too many intent requests for this user.", wait)
+        # Every limited role the caller holds is charged, so a multi-role user counts against each pool.
+        charged: List[str] = []
+        for role in dict.fromkeys(roles):
+            role_limiter = self.role_limiters.get(role)
+            if role_limiter is None:
+                continue
+            wait = role_limiter.try_acquire(role, now)
+            if wait:
+                self._refund(user, charged)
+                raise AdmissionRejected(429, f"Too many intent requests for role '{role}'.", wait)
+            charged.append(role)
+
+        try:
+            await self.gate.acquire(priority)
+        except AdmissionRejected:
+            # Shed before reaching the LLM; don't charge the caller's quota.
+            self._refund(user, charged)
+            raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.gate.release(time.monotonic() - started)
+
+    def _refund(self, user: str, roles: List[str]) -> None:
+        self.user_limiter.refund(user)
+        for role in roles:
+            self.role_limiters[role].refund(role)
+
+INTENT_ADMISSION = AdmissionController()
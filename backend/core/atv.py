@@ -1,4 +1,6 @@
 # atv.py (refactored for RSA signatures)
+import hashlib
+from typing import List, Tuple
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
@@ -42,3 +44,59 @@ def verify_signature(message: str, signature: bytes, public_key: RSAPublicKey) -
         return True
     except Exception:
         return False
+
+
+# --------------------------------------------------------------------
+# Batch signing (Merkle tree over the batch messages)
+# --------------------------------------------------------------------
+# A batch is signed once: every message becomes a leaf, and only the root
+# is RSA-signed. Each item keeps its own inclusion proof so it can later be
+# verified on its own without the rest of the batch.
+def _leaf_hash(message: str) -> bytes:
+    return hashlib.sha256(b"\x00" + message.encode()).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_tree(messages: List[str]) -> Tuple[str, List[List[List[str]]]]:
+    """
+    Returns (root_hex, proofs) for the given messages. proofs[i] is a list of
+    [side, sibling_hex] pairs from leaf i up to the root, where side is "L" or
+    "R" depending on which side the sibling sits.
+    """
+    if not messages:
+        raise ValueError("Cannot build a Merkle tree over an empty batch.")
+
+    level = [_leaf_hash(m) for m in messages]
+    positions = list(range(len(messages)))
+    proofs: List[List[List[str]]] = [[] for _ in messages]
+
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level), 2):
+            if i + 1 < len(level):
+                next_level.append(_node_hash(level[i], level[i + 1]))
+            else:
+                # Odd node out is promoted unchanged to the next level.
+                next_level.append(level[i])
+
+        for leaf, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                side = "L" if sibling < pos else "R"
+                proofs[leaf].append([side, level[sibling].hex()])
+            positions[leaf] = pos // 2
+        level = next_level
+
+    return level[0].hex(), proofs
+
+
+def merkle_root_from_proof(message: str, proof: List[List[str]]) -> str:
+    """Recomputes the batch root from a single message and its inclusion proof."""
+    node = _leaf_hash(message)
+    for side, sibling_hex in proof:
+        sibling = bytes.fromhex(sibling_hex)
+        node = _node_hash(sibling, node) if side == "L" else _node_hash(node, sibling)
+    return node.hex()
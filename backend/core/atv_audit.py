@@ -0,0 +1,156 @@
+# atv_audit.py
+# Offline bulk verification of the ATV signatures stored in the audit ledger.
+#
+# Every query_success event stores the masked input and the RSA signature over
+# it (or, for batch items, over the batch Merkle root plus the item's inclusion
+# proof). verify_ledger() streams those rows in id order, from the archive
+# segments and then acl.db, and fans chunks of still-encrypted rows out to a
+# process pool. The workers decrypt and verify, so both Fernet and RSA work
+# run in parallel. A worker verifies each (root, signature) pair once, so a
+# batch costs one RSA verify no matter how many items it holds.
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core import acl
+from core.audit_archive import AUDIT_ARCHIVE, AuditArchive
+from core.atv import load_public_key, merkle_root_from_proof, verify_signature
+
+PUBLIC_KEY_PATH = "keys/public_key.pem"
+
+Row = Tuple[int, str, Optional[int]]  # (id, encrypted payload, key_version)
+
+# Per-worker state, set by _init_worker.
+_public_key = None
+_root_cache: Dict[Tuple[str, str], bool] = {}
+
+
+def _init_worker(public_key_path: str) -> None:
+    global _public_key
+    _public_key = load_public_key(public_key_path)
+    _root_cache.clear()
+
+
+def verify_payload(payload: Dict[str, Any], public_key=None) -> Optional[str]:
+    """Checks one decrypted query_success payload. Returns None if valid, else the reason."""
+    public_key = public_key or _public_key
+    signature_hex = payload.get("signature_hex")
+    message = payload.get("input_masked")
+    if not signature_hex or signature_hex == "N/A" or message is None:
+        return "missing signature or signed input"
+    try:
+        signature = bytes.fromhex(signature_hex)
+    except ValueError:
+        return "signature is not valid hex"
+
+    root = payload.get("merkle_root")
+    if root is None:
+        return None if verify_signature(message, signature, public_key) else "signature mismatch"
+
+    try:
+        proof_root = merkle_root_from_proof(message, payload.get("merkle_proof") or [])
+    except (TypeError, ValueError):
+        return "malformed Merkle proof"
+    if proof_root != root:
+        return "Merkle proof does not lead to the signed root"
+    key = (root, signature_hex)
+    if key not in _root_cache:
+        _root_cache[key] = verify_signature(root, signature, public_key)
+    return None if _root_cache[key] else "signature mismatch on Merkle root"
+
+
+def _verify_chunk(rows: List[Row]) -> Tuple[int, List[Tuple[int, str]]]:
+    failures = []
+    for event_id, encrypted, key_version in rows:
+        try:
+            payload = json.loads(acl.decrypt_payload(encrypted, key_version))
+        except Exception:
+            failures.append((event_id, "payload cannot be decrypted"))
+            continue
+        reason = verify_payload(payload)
+        if reason:
+            failures.append((event_id, reason))
+    return len(rows), failures
+
+
+def iter_signed_rows(db_path: str, chunk_size: int, since_id: int = 0,
+                     archive: Optional[AuditArchive] = AUDIT_ARCHIVE) -> Iterator[List[Row]]:
+    """
+    Yields query_success rows in id order, chunk by chunk, without loading the
+    table: first those in the archive segments, then those still in acl.db.
+    """
+    archived_up_to = 0
+    if archive is not None:
+        archived_up_to = archive.last_archived_id()
+        chunk: List[Row] = []
+        for event_id, _, event_type, payload, key_version in archive.iter_rows(since_id):
+            if event_type == "query_success":
+                chunk.append((event_id, payload, key_version))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # Rows of an interrupted archiving run can exist in both tiers; they were checked above.
+        last_id = max(since_id, archived_up_to)
+        while True:
+            rows = conn.execute(
+                "SELECT id, payload, key_version FROM audit WHERE event_type = 'query_success' AND id > ? "
+                "ORDER BY id LIMIT ?", (last_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def verify_ledger(db_path: str = acl.DB_PATH, public_key_path: str = PUBLIC_KEY_PATH,
+                  workers: Optional[int] = None, chunk_size: int = 500, since_id: int = 0,
+                  max_reported: int = 100) -> Dict[str, Any]:
+    """
+    Verifies every stored ATV signature and returns a report with rows/s, the
+    number of failures, the first failing event ID and up to `max_reported`
+    (event_id, reason) mismatches.
+    """
+    workers = workers or os.cpu_count() or 1
+    checked = 0
+    failures: List[Tuple[int, str]] = []
+    failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(public_key_path,)) as pool:
+        pending = set()
+        # Keep a bounded number of chunks in flight so memory stays flat on large ledgers.
+        for chunk in iter_signed_rows(db_path, chunk_size, since_id):
+            pending.add(pool.submit(_verify_chunk, chunk))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    count, chunk_failures = future.result()
+                    checked += count
+                    failed += len(chunk_failures)
+                    failures = sorted(failures + chunk_failures)[:max_reported]
+        for future in pending:
+            count, chunk_failures = future.result()
+            checked += count
+            failed += len(chunk_failures)
+            failures = sorted(failures + chunk_failures)[:max_reported]
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows_checked": checked,
+        "failed": failed,
+        "first_failing_id": failures[0][0] if failures else None,
+        "mismatches": [{"event_id": event_id, "reason": reason} for event_id, reason in failures],
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(checked / elapsed, 1) if elapsed else None,
+        "workers": workers,
+    }
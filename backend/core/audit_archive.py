@@ -0,0 +1,232 @@
+# audit_archive.py
+# Cold tier of the audit ledger: immutable, append-only segment files.
+#
+# core/retention.py moves events older than the retention threshold out of
+# acl.db into segments. Each segment holds a contiguous range of event IDs in
+# two files:
+#
+#   seg-<first>-<last>.dat  one JSON record per event: [id, timestamp, event_type, payload].
+#                           The payload is the Fernet token from acl.db, so it
+#                           stays encrypted under the key that wrote it.
+#   seg-<first>-<last>.idx  header + one fixed-width entry per ID in the range
+#                           (offset, length, key_version). The entry of event N
+#                           sits at HEADER + (N - first) * ENTRY, so a lookup
+#                           is one bisect over the segments plus one read of the
+#                           mmap'ed index. IDs that were never written have a
+#                           zero-length entry.
+#
+# Segments are written to temporary files, fsync'ed, renamed into place (the
+# .idx rename commits the segment) and made read-only. They are never modified
+# afterwards. New segments only cover IDs above the last archived one.
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+
+# magic, first_id, entry count, data size, sha256 of the data file
+_HEADER = struct.Struct("<8sQQQ32s")
+_MAGIC = b"AUDSEG01"
+# offset in the data file, record length (0 = no event), key_version (-1 = unknown)
+_ENTRY = struct.Struct("<QIi")
+_SEGMENT_RE = re.compile(r"^seg-(\d{12})-(\d{12})\.idx$")
+
+# Same shape as the (id, timestamp, event_type, payload, key_version) rows of acl.db.
+ArchivedRow = Tuple[int, str, str, Optional[str], Optional[int]]
+
+
+def _segment_base(directory: str, first_id: int, last_id: int) -> str:
+    return os.path.join(directory, f"seg-{first_id:012d}-{last_id:012d}")
+
+
+def _fsync_dir(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Segment:
+    """Read-only view of one archive segment; both files are memory-mapped."""
+
+    def __init__(self, directory: str, first_id: int, last_id: int):
+        self.first_id = first_id
+        self.last_id = last_id
+        base = _segment_base(directory, first_id, last_id)
+        self.index_path, self.data_path = base + ".idx", base + ".dat"
+        with open(self.index_path, "rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.data_path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, first, count, self.data_size, self.digest = _HEADER.unpack_from(self._index, 0)
+        if magic != _MAGIC or first != first_id or count != last_id - first_id + 1:
+            raise ValueError(f"Corrupt archive segment header: {self.index_path}")
+        if len(self._index) != _HEADER.size + count * _ENTRY.size or len(self._data) != self.data_size:
+            raise ValueError(f"Truncated archive segment: {base}")
+
+    def _entry(self, event_id: int) -> Tuple[int, int, int]:
+        return _ENTRY.unpack_from(self._index, _HEADER.size + (event_id - self.first_id) * _ENTRY.size)
+
+    def _record(self, offset: int, length: int, key_version: int) -> ArchivedRow:
+        event_id, timestamp, event_type, payload = json.loads(self._data[offset:offset + length])
+        return event_id, timestamp, event_type, payload, None if key_version < 0 else key_version
+
+    def read(self, event_id: int) -> Optional[ArchivedRow]:
+        if not self.first_id <= event_id <= self.last_id:
+            return None
+        offset, length, key_version = self._entry(event_id)
+        return self._record(offset, length, key_version) if length else None
+
+    def rows(self, since_id: int = 0) -> Iterator[ArchivedRow]:
+        for event_id in range(max(self.first_id, since_id + 1), self.last_id + 1):
+            offset, length, key_version = self._entry(event_id)
+            if length:
+                yield self._record(offset, length, key_version)
+
+    @property
+    def row_count(self) -> int:
+        return sum(1 for event_id in range(self.first_id, self.last_id + 1) if self._entry(event_id)[1])
+
+    def key_version_counts(self) -> Dict[Optional[int], int]:
+        """Number of events per key_version, read from the index alone."""
+        counts: Dict[Optional[int], int] = {}
+        for _, length, key_version in _ENTRY.iter_unpack(self._index[_HEADER.size:]):
+            if length:
+                version = None if key_version < 0 else key_version
+                counts[version] = counts.get(version, 0) + 1
+        return counts
+
+    def verify(self) -> bool:
+        """True if the data file still matches the checksum recorded when it was written."""
+        return hashlib.sha256(self._data).digest() == self.digest
+
+    def close(self) -> None:
+        self._index.close()
+        self._data.close()
+
+
+def write_segment(directory: str, rows: List[ArchivedRow]) -> Tuple[int, int]:
+    """Writes rows (ascending IDs) as a new immutable segment and returns its (first_id, last_id)."""
+    first_id, last_id = rows[0][0], rows[-1][0]
+    entries = bytearray(_ENTRY.size * (last_id - first_id + 1))
+    data = bytearray()
+    for event_id, timestamp, event_type, payload, key_version in rows:
+        record = json.dumps([event_id, timestamp, event_type, payload], ensure_ascii=False).encode() + b"\n"
+        _ENTRY.pack_into(entries, (event_id - first_id) * _ENTRY.size,
+                         len(data), len(record), -1 if key_version is None else key_version)
+        data += record
+    header = _HEADER.pack(_MAGIC, first_id, last_id - first_id + 1, len(data), hashlib.sha256(data).digest())
+
+    os.makedirs(directory, exist_ok=True)
+    base = _segment_base(directory, first_id, last_id)
+    for suffix, content in ((".dat", data), (".idx", header + entries)):
+        tmp_path = base + suffix + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)  # left over from an interrupted run (read-only)
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, base + suffix)
+    _fsync_dir(directory)
+    return first_id, last_id
+
+
+class AuditArchive:
+    """
+    All segments in one directory. The segment list is re-scanned when the
+    directory changes, so segments written by another process are picked up.
+    """
+
+    def __init__(self, directory: str = AUDIT_ARCHIVE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segments: List[Segment] = []
+        self._firsts: List[int] = []
+        self._dir_mtime: Optional[int] = None
+
+    def _refresh(self, force: bool = False) -> None:
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._dir_mtime and not force:
+            return
+        known = {(s.first_id, s.last_id): s for s in self._segments}
+        ranges = sorted(
+            (int(m.group(1)), int(m.group(2)))
+            for m in map(_SEGMENT_RE.match, os.listdir(self.directory)) if m
+        )
+        self._segments = [known.get(r) or Segment(self.directory, *r) for r in ranges]
+        self._firsts = [s.first_id for s in self._segments]
+        self._dir_mtime = mtime
+
+    def segments(self) -> List[Segment]:
+        with self._lock:
+            self._refresh()
+            return list(self._segments)
+
+    def read(self, event_id: int) -> Optional[ArchivedRow]:
+        """O(1) lookup of an archived event row, or None."""
+        with self._lock:
+            self._refresh()
+            if not self._segments or event_id > self._segments[-1].last_id:
+                # Directory mtimes are coarse; make sure a just-written segment is not missed.
+                self._refresh(force=True)
+            position = bisect.bisect_right(self._firsts, event_id) - 1
+            if position < 0:
+                return None
+            return self._segments[position].read(event_id)
+
+    def last_archived_id(self) -> int:
+        segments = self.segments()
+        return segments[-1].last_id if segments else 0
+
+    def append(self, rows: List[ArchivedRow]) -> Tuple[int, int]:
+        """Writes rows as a new segment; they must all come after the last archived ID."""
+        if not rows:
+            raise ValueError("Cannot write an empty archive segment.")
+        if rows[0][0] <= self.last_archived_id():
+            raise ValueError(f"Event {rows[0][0]} is already covered by an archive segment.")
+        return write_segment(self.directory, rows)
+
+    def iter_rows(self, since_id: int = 0) -> Iterator[ArchivedRow]:
+        """All archived rows with an ID above since_id, in ID order."""
+        for segment in self.segments():
+            if segment.last_id > since_id:
+                yield from segment.rows(since_id)
+
+    def key_version_counts(self) -> Dict[Optional[int], int]:
+        """Archived events per key_version (None = unknown); segments are never re-encrypted."""
+        counts: Dict[Optional[int], int] = {}
+        for segment in self.segments():
+            for version, count in segment.key_version_counts().items():
+                counts[version] = counts.get(version, 0) + count
+        return counts
+
+    def status(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            "directory": self.directory,
+            "segments": len(segments),
+            "first_id": segments[0].first_id if segments else None,
+            "last_id": segments[-1].last_id if segments else None,
+            "rows": sum(s.row_count for s in segments),
+            "data_bytes": sum(s.data_size for s in segments),
+        }
+
+
+# Process-wide archive used by core/acl.get_event and core/retention.
+AUDIT_ARCHIVE = AuditArchive()
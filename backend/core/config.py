@@ -9,6 +9,9 @@ class Settings(BaseSettings):
     GOOGLE_GEMINI_API_KEY: str
     KEY_PASSPHRASE: str
     DB_ENCRYPTION_KEY: str
+    # "gemini" for the live API, "mock" for the local stand-in (scripts/mock_llm_server.py)
+    LLM_BACKEND: str = "gemini"
+    MOCK_LLM_URL: str = "http://127.0.0.1:8765"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,60 @@
+# executors.py
+# Sized thread pools for the CPU-bound stages of the async request pipeline.
+#
+# spaCy NER and RSA signing are dispatched here instead of running on the
+# event loop or in Starlette's default 40-thread pool. Both release the GIL
+# for most of their work (spaCy's Cython/thinc kernels, OpenSSL), so one
+# thread per core gives real parallelism without a process per model copy.
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_CPUS = os.cpu_count() or 2
+
+
+class LazyExecutor:
+    """
+    A ThreadPoolExecutor created on first use. shutdown() drops it and the
+    next call creates a fresh one, so the app lifespan can run more than once
+    per process (reloads, several TestClient contexts).
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix=self.thread_name_prefix)
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+NER_EXECUTOR = LazyExecutor(int(os.getenv("LDG_NER_WORKERS", str(_CPUS))), "ldg-ner")
+CRYPTO_EXECUTOR = LazyExecutor(int(os.getenv("ATV_CRYPTO_WORKERS", str(_CPUS))), "atv-crypto")
+
+
+async def run_in(executor: LazyExecutor, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs fn(*args, **kwargs) on the given executor and awaits the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor.get(), partial(fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Stops both pools (lifespan shutdown); they are recreated on the next run_in."""
+    NER_EXECUTOR.shutdown()
+    CRYPTO_EXECUTOR.shutdown()
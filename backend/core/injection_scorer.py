@@ -0,0 +1,143 @@
+# injection_scorer.py
+# Second-stage prompt-injection classifier.
+#
+# The regex filters only catch the exact phrasings they list. This scorer is a
+# logistic regression over hashed n-gram features of the normalized text:
+# character 3-5-grams (robust to small spelling changes) and word 1-2-grams,
+# hashed into a fixed number of buckets. Its cost per prompt depends only on
+# the prompt length, not on how many rules exist, and a whole batch is scored
+# with one vectorized dot product.
+#
+# The model is trained and exported by scripts/train_injection_scorer.py into
+# an .npz file (INJECTION_MODEL_PATH). Without a model file the scorer is
+# disabled and the regex filters work as before.
+import logging
+import os
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INJECTION_MODEL_PATH = os.getenv("INJECTION_MODEL_PATH", "models/injection_scorer.npz")
+# Overrides the threshold stored with the model when set.
+INJECTION_SCORE_THRESHOLD = os.getenv("INJECTION_SCORE_THRESHOLD")
+
+DEFAULT_N_FEATURES = 2 ** 18
+DEFAULT_CHAR_NGRAMS = (3, 5)
+DEFAULT_WORD_NGRAMS = (1, 2)
+
+_CHAR_SEED = 0x9E3779B97F4A7C15
+_MULTIPLIER = np.uint64(1099511628211)
+
+
+def _char_ngram_hashes(text: str, low: int, high: int) -> np.ndarray:
+    """Polynomial hashes of all character n-grams (low <= n <= high), computed with NumPy."""
+    codes = np.frombuffer(f" {text} ".encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    parts = []
+    for n in range(low, high + 1):
+        if len(codes) < n:
+            break
+        windows = np.lib.stride_tricks.sliding_window_view(codes, n)
+        powers = _MULTIPLIER ** np.arange(n, dtype=np.uint64)
+        # uint64 arithmetic wraps around, which is what we want for hashing.
+        seed = np.uint64((_CHAR_SEED * n) & 0xFFFFFFFFFFFFFFFF)
+        parts.append((windows * powers).sum(axis=1, dtype=np.uint64) ^ seed)
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+
+
+def _word_ngram_hashes(text: str, low: int, high: int) -> np.ndarray:
+    words = text.split()
+    hashes = [
+        zlib.crc32(" ".join(words[i:i + n]).encode()) | (n << 32)
+        for n in range(low, high + 1)
+        for i in range(len(words) - n + 1)
+    ]
+    return np.array(hashes, dtype=np.uint64)
+
+
+def featurize(texts: Iterable[str], n_features: int = DEFAULT_N_FEATURES,
+              char_ngrams: Tuple[int, int] = DEFAULT_CHAR_NGRAMS,
+              word_ngrams: Tuple[int, int] = DEFAULT_WORD_NGRAMS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sparse features for a batch of (already normalized) texts, as parallel
+    arrays (row, column, value). Each row is L2-normalized so prompt length
+    does not dominate the score.
+    """
+    rows, cols, vals = [], [], []
+    for row, text in enumerate(texts):
+        hashes = np.concatenate([_char_ngram_hashes(text, *char_ngrams), _word_ngram_hashes(text, *word_ngrams)])
+        if not len(hashes):
+            continue
+        buckets, counts = np.unique(hashes % np.uint64(n_features), return_counts=True)
+        weights = counts.astype(np.float32)
+        rows.append(np.full(len(buckets), row, dtype=np.int64))
+        cols.append(buckets.astype(np.int64))
+        vals.append(weights / np.linalg.norm(weights))
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class InjectionScorer:
+    """Hashed n-gram logistic regression; scores are injection probabilities in [0, 1]."""
+
+    def __init__(self, weights: np.ndarray, bias: float, threshold: float = 0.5,
+                 char_ngrams: Tuple[int, int] = DEFAULT_CHAR_NGRAMS,
+                 word_ngrams: Tuple[int, int] = DEFAULT_WORD_NGRAMS):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.threshold = threshold
+        self.char_ngrams = tuple(char_ngrams)
+        self.word_ngrams = tuple(word_ngrams)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.weights)
+
+    def decision_function(self, texts: List[str]) -> np.ndarray:
+        rows, cols, vals = featurize(texts, self.n_features, self.char_ngrams, self.word_ngrams)
+        return np.bincount(rows, weights=self.weights[cols] * vals, minlength=len(texts)) + self.bias
+
+    def score_batch(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty(0)
+        return sigmoid(self.decision_function(texts))
+
+    def score(self, text: str) -> float:
+        return float(self.score_batch([text])[0])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path, weights=self.weights, bias=np.float64(self.bias), threshold=np.float64(self.threshold),
+            char_ngrams=np.array(self.char_ngrams), word_ngrams=np.array(self.word_ngrams),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "InjectionScorer":
+        with np.load(path) as data:
+            return cls(
+                data["weights"], float(data["bias"]), float(data["threshold"]),
+                tuple(int(n) for n in data["char_ngrams"]), tuple(int(n) for n in data["word_ngrams"]),
+            )
+
+
+def load_scorer(path: str = INJECTION_MODEL_PATH) -> Optional[InjectionScorer]:
+    """Loads the exported model, or returns None (scorer disabled) if it is missing or unreadable."""
+    if not os.path.exists(path):
+        logger.info("No injection scorer model at %s; classifier stage disabled.", path)
+        return None
+    try:
+        scorer = InjectionScorer.load(path)
+    except Exception as e:
+        logger.error("Could not load injection scorer model %s: %s", path, e)
+        return None
+    if INJECTION_SCORE_THRESHOLD is not None:
+        scorer.threshold = float(INJECTION_SCORE_THRESHOLD)
+    return scorer
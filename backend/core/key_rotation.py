@@ -0,0 +1,234 @@
+# key_rotation.py
+# Online re-encryption of the audit ledger after a DB key rotation.
+#
+# Rotating the key is a config change: the new key becomes DB_ENCRYPTION_KEY
+# (with a higher DB_ENCRYPTION_KEY_VERSION) and the old one moves to
+# DB_ENCRYPTION_PREVIOUS_KEYS. New events are written with the new key right
+# away and old ones stay readable. ReencryptionJob then rewrites the old rows
+# in small id-ordered batches, each in its own short transaction together with
+# its progress checkpoint, so it can run next to live traffic, be throttled,
+# and resume where it stopped after a restart.
+#
+# Archived segments (core/audit_archive.py) are immutable and keep the key
+# they were written with, so status() counts them per key version and only
+# lists a previous key as retirable once neither tier still uses it.
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from cryptography.fernet import InvalidToken
+
+from core import acl
+from core.audit_archive import AUDIT_ARCHIVE, AuditArchive
+
+logger = logging.getLogger(__name__)
+
+REENCRYPT_BATCH_SIZE = int(os.getenv("ACL_REENCRYPT_BATCH_SIZE", "200"))
+REENCRYPT_ROWS_PER_SECOND = float(os.getenv("ACL_REENCRYPT_ROWS_PER_SECOND", "500"))
+MAX_REPORTED_SKIPPED = 100
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _init_progress_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS key_rotation (
+            target_version INTEGER PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            rows_done INTEGER NOT NULL,
+            started_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            finished_at TEXT,
+            rows_skipped INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # Progress tables created before skipped rows were counted.
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(key_rotation)")]
+    if "rows_skipped" not in columns:
+        conn.execute("ALTER TABLE key_rotation ADD COLUMN rows_skipped INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+
+
+class ReencryptionJob:
+    """
+    Re-encrypts every audit row not yet under the primary key. At most one
+    job runs per process; progress lives in the key_rotation table, keyed by
+    the target key version.
+    """
+
+    def __init__(self, batch_size: int = REENCRYPT_BATCH_SIZE, rows_per_second: float = REENCRYPT_ROWS_PER_SECOND,
+                 archive: AuditArchive = AUDIT_ARCHIVE):
+        self.batch_size = batch_size
+        self.rows_per_second = rows_per_second
+        self.target_version = acl.PRIMARY_KEY_VERSION
+        self.archive = archive
+        self.error: Optional[str] = None
+        # IDs of rows no configured key could decrypt (most recent run, capped).
+        self.skipped_ids: List[int] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------------- progress ----------------
+    def _progress(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        fields = ("last_id", "rows_done", "rows_skipped", "started_at", "updated_at", "finished_at")
+        row = conn.execute(
+            f"SELECT {', '.join(fields)} FROM key_rotation WHERE target_version = ?", (self.target_version,),
+        ).fetchone()
+        if row is None:
+            return {"last_id": 0, "rows_done": 0, "rows_skipped": 0, "started_at": None, "updated_at": None,
+                    "finished_at": None}
+        return dict(zip(fields, row))
+
+    def status(self) -> Dict[str, Any]:
+        conn = sqlite3.connect(acl.DB_PATH)
+        try:
+            _init_progress_table(conn)
+            progress = self._progress(conn)
+            # Rows up to last_id were scanned already; old-key rows among them are the skipped ones.
+            hot = dict(conn.execute(
+                "SELECT key_version, COUNT(*) FROM audit WHERE id > ? AND payload IS NOT NULL "
+                "AND (key_version IS NULL OR key_version != ?) GROUP BY key_version",
+                (progress["last_id"], self.target_version),
+            ).fetchall())
+        finally:
+            conn.close()
+        archived = {v: n for v, n in self.archive.key_version_counts().items() if v != self.target_version}
+        in_use = set(hot) | set(archived)
+        # Rows without a known version are decrypted by trying every key, so they pin all of them.
+        retirable = [] if None in in_use else sorted(
+            v for v in acl.KEYRING if v != self.target_version and v not in in_use
+        )
+        return {
+            "target_version": self.target_version,
+            "running": self.is_running(),
+            "rows_done": progress["rows_done"],
+            "rows_remaining": sum(hot.values()),
+            "archived_old_key_rows": sum(archived.values()),
+            "archived_key_versions": {"unknown" if v is None else str(v): n for v, n in archived.items()},
+            "retirable_key_versions": retirable,
+            "rows_skipped": progress["rows_skipped"],
+            "skipped_ids": list(self.skipped_ids),
+            "last_id": progress["last_id"],
+            "started_at": progress["started_at"],
+            "updated_at": progress["updated_at"],
+            "finished_at": progress["finished_at"],
+            "rows_per_second_limit": self.rows_per_second,
+            "error": self.error,
+        }
+
+    # ---------------- work ----------------
+    def run_batch(self, conn: sqlite3.Connection) -> int:
+        """Re-encrypts the next batch and checkpoints it. Returns the number of rows scanned (0 = done)."""
+        progress = self._progress(conn)
+        rows = conn.execute(
+            "SELECT id, payload, key_version FROM audit WHERE id > ? ORDER BY id LIMIT ?",
+            (progress["last_id"], self.batch_size),
+        ).fetchall()
+        now = _now()
+        if not rows:
+            conn.execute(
+                "UPDATE key_rotation SET finished_at = ?, updated_at = ? WHERE target_version = ? AND finished_at IS NULL",
+                (now, now, self.target_version),
+            )
+            conn.commit()
+            return 0
+
+        updates, skipped = [], 0
+        for row_id, payload, key_version in rows:
+            if not payload or key_version == self.target_version:
+                continue
+            try:
+                plaintext = acl.decrypt_payload(payload, key_version)
+            except InvalidToken:
+                # E.g. written with a key that is no longer configured: leave the row as it is and move on.
+                logger.warning("Audit row %s (key v%s) cannot be decrypted; skipped by re-encryption", row_id, key_version)
+                skipped += 1
+                if len(self.skipped_ids) < MAX_REPORTED_SKIPPED:
+                    self.skipped_ids.append(row_id)
+                continue
+            updates.append((acl.encrypt_payload(plaintext), self.target_version, row_id, self.target_version))
+        try:
+            # The key_version guard leaves rows alone that were rewritten concurrently.
+            conn.executemany(
+                "UPDATE audit SET payload = ?, key_version = ? WHERE id = ? AND key_version IS NOT ?", updates
+            )
+            conn.execute(
+                """
+                INSERT INTO key_rotation (target_version, last_id, rows_done, rows_skipped, started_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(target_version) DO UPDATE SET
+                    last_id = excluded.last_id,
+                    rows_done = key_rotation.rows_done + ?,
+                    rows_skipped = key_rotation.rows_skipped + ?,
+                    updated_at = excluded.updated_at
+                """,
+                (self.target_version, rows[-1][0], len(updates), skipped, now, now, len(updates), skipped),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+    def run(self) -> Dict[str, Any]:
+        """Runs the job to completion on the calling thread (or until stop() is called)."""
+        self.error = None
+        self.skipped_ids = []
+        conn = sqlite3.connect(acl.DB_PATH, timeout=30)
+        try:
+            _init_progress_table(conn)
+            while not self._stop.is_set():
+                started = time.monotonic()
+                scanned = self.run_batch(conn)
+                if scanned == 0:
+                    logger.info("Audit ledger re-encrypted under key v%s", self.target_version)
+                    break
+                if self.rows_per_second > 0:
+                    # Throttle: spread batches out so live writers keep getting the lock.
+                    delay = scanned / self.rows_per_second - (time.monotonic() - started)
+                    if delay > 0:
+                        self._stop.wait(delay)
+        except Exception as e:
+            self.error = str(e)
+            logger.error("Audit re-encryption to key v%s failed: %s", self.target_version, e)
+            raise
+        finally:
+            conn.close()
+        return self.status()
+
+    # ---------------- background ----------------
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Starts the job on a background thread. Returns False if it is already running."""
+        if self.is_running():
+            return False
+        self._stop.clear()
+
+        def _run():
+            try:
+                self.run()
+            except Exception:
+                pass  # recorded in self.error
+
+        self._thread = threading.Thread(target=_run, name="acl-reencrypt", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+
+# Process-wide job used by the admin endpoints.
+REENCRYPTION_JOB = ReencryptionJob()
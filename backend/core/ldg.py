@@ -2,6 +2,12 @@ import json
 import os
 import re
 import spacy
+from typing import List, Optional, Union
+from core.malicious_patterns import MALICIOUS_PATTERNS
+from core.regex_guard import compile_pattern, GuardedPattern, PatternBudgetExceeded
+from core.ldg_rules import LDGRuleSet, LDGRuleStore
+from core.text_analysis import AnalysisContext, StreamNormalizer
+from core.injection_scorer import load_scorer
 
 CONFIG_PATH = "blocked_keywords.json"
 
@@ -21,7 +27,36 @@ def load_ldg_config():
         "output_patterns": []
     }
 
-LDG_CONFIG = load_ldg_config()
+# Active LDG rules. Patterns are analyzed for catastrophic backtracking and
+# compiled once per version; the store swaps in new versions when
+# blocked_keywords.json changes (see main.py) or an admin uploads rules.
+RULE_STORE = LDGRuleStore(CONFIG_PATH)
+RULE_STORE.load()
+RELOAD_INTERVAL_SECONDS = float(os.getenv("LDG_RELOAD_INTERVAL_SECONDS", "5"))
+# Second-stage classifier for paraphrased injections; None if no model has been trained.
+INJECTION_SCORER = load_scorer()
+# Upper bound (in normalized characters) on how much streamed output is held back.
+STREAM_MAX_HOLDBACK = int(os.getenv("LDG_STREAM_MAX_HOLDBACK", "256"))
+
+MALICIOUS_PREFILTER = [
+    compile_pattern(pattern, re.IGNORECASE, source=f"MALICIOUS_PATTERNS[{category}]")
+    for category, patterns in MALICIOUS_PATTERNS.items()
+    for pattern in patterns
+]
+
+BUDGET_EXCEEDED_REASON = "Filter evaluation exceeded its time budget"
+
+TextInput = Union[str, AnalysisContext]
+
+
+def analyze(text: TextInput) -> AnalysisContext:
+    """
+    Returns the shared analysis context for a text. Create it once per request
+    and pass it to every filter; plain strings are wrapped on the fly.
+    """
+    if isinstance(text, AnalysisContext):
+        return text
+    return AnalysisContext(text, nlp)
 
 # -------------------------------
 SENSITIVE_PATTERNS = {
@@ -31,27 +66,40 @@ SENSITIVE_PATTERNS = {
     r"\b\d{4}-?\d{4}-?\d{4}-?\d{4}\b": "****-****-****-****",               # Credit Card
     r"\b(?:\d{1,3}\.){3}\d{1,3}\b": "xxx.xxx.xxx.xxx",                        # IPv4 Address
 }
+SENSITIVE_MASKS = [(compile_pattern(pattern, source="SENSITIVE_PATTERNS"), mask) for pattern, mask in SENSITIVE_PATTERNS.items()]
 
 
 # -------------------------------
 # Input Validation
 # -------------------------------
-def ldg_input_check(user_input: str) -> dict:
-    masked_input = user_input
-    detected_entities = []
+NER_LABELS = ["PERSON", "EMAIL", "GPE", "ORG", "PHONE", "CARDINAL"]
 
-    
-    for pattern in LDG_CONFIG.get("input_patterns", []):
-        if re.search(pattern, user_input, flags=re.IGNORECASE):
-            return {"status": "blocked", "reason": f"Blocked pattern '{pattern}' detected"}
 
-    for pattern, mask in SENSITIVE_PATTERNS.items():
-        masked_input = re.sub(pattern, mask, masked_input)
+def _check_blocked_input(ctx: AnalysisContext, rules: LDGRuleSet):
+    try:
+        for pattern in rules.input_patterns:
+            if pattern.search(ctx.normalized):
+                return {"status": "blocked", "reason": f"Blocked pattern '{pattern.pattern}' detected"}
+        return None
+    except PatternBudgetExceeded:
+        return {"status": "blocked", "reason": BUDGET_EXCEEDED_REASON}
 
-    if nlp:
-        doc = nlp(user_input)
+
+def _mask_input(ctx: AnalysisContext) -> dict:
+    # Masking rewrites the original text; matching above used the normalized form.
+    masked_input = ctx.text
+    detected_entities = []
+
+    try:
+        for pattern, mask in SENSITIVE_MASKS:
+            masked_input = pattern.sub(mask, masked_input)
+    except PatternBudgetExceeded:
+        return {"status": "blocked", "reason": BUDGET_EXCEEDED_REASON}
+
+    doc = ctx.doc
+    if doc is not None:
         for ent in doc.ents:
-            if ent.label_ in ["PERSON", "EMAIL", "GPE", "ORG", "PHONE", "CARDINAL"]:
+            if ent.label_ in NER_LABELS:
                 detected_entities.append(ent.label_)
                 masked_input = masked_input.replace(ent.text, "*" * len(ent.text))
 
@@ -62,21 +110,191 @@ def ldg_input_check(user_input: str) -> dict:
     }
 
 
+def ldg_input_check(user_input: TextInput, rules: Optional[LDGRuleSet] = None) -> dict:
+    rules = rules or RULE_STORE.current()
+    ctx = analyze(user_input)
+    blocked = _check_blocked_input(ctx, rules)
+    if blocked:
+        return blocked
+    return _mask_input(ctx)
+
+
+def ldg_input_check_batch(user_inputs: List[TextInput], rules: Optional[LDGRuleSet] = None) -> List[dict]:
+    """
+    Same as ldg_input_check for many inputs at once. Blocked inputs are
+    filtered first, and the rest go through spaCy in a single nlp.pipe call.
+    """
+    rules = rules or RULE_STORE.current()
+    contexts = [analyze(text) for text in user_inputs]
+    results: List[Optional[dict]] = [_check_blocked_input(ctx, rules) for ctx in contexts]
+    pending = [contexts[i] for i, r in enumerate(results) if r is None]
+
+    if nlp:
+        for ctx, doc in zip(pending, nlp.pipe(ctx.text for ctx in pending)):
+            ctx.set_doc(doc)
+    for i, ctx in enumerate(contexts):
+        if results[i] is None:
+            results[i] = _mask_input(ctx)
+    return results
+
+
 # -------------------------------
 # -------------------------------
-def detect_prompt_injection(prompt: str) -> dict:
-    lp = prompt.lower()
-    for pattern in LDG_CONFIG.get("prompt_injection_patterns", []):
-        if re.search(pattern.lower(), lp):
-            return {"status": "blocked", "reason": "Potential prompt injection detected"}
+def _injection_regex_check(lp: str, rules: LDGRuleSet) -> Optional[dict]:
+    try:
+        for pattern in rules.prompt_injection_patterns:
+            if pattern.search(lp):
+                return {"status": "blocked", "reason": "Potential prompt injection detected"}
+    except PatternBudgetExceeded:
+        return {"status": "blocked", "reason": BUDGET_EXCEEDED_REASON}
+    return None
+
+
+def _classifier_result(score: float) -> dict:
+    if score >= INJECTION_SCORER.threshold:
+        return {"status": "blocked", "score": round(score, 4),
+                "reason": f"Potential prompt injection detected (classifier score {score:.2f})"}
+    return {"status": "ok", "score": round(score, 4)}
+
+
+def detect_prompt_injection(prompt: TextInput, rules: Optional[LDGRuleSet] = None) -> dict:
+    rules = rules or RULE_STORE.current()
+    lp = analyze(prompt).normalized
+    result = _injection_regex_check(lp, rules)
+    if result is not None:
+        return result
+    if INJECTION_SCORER is not None:
+        return _classifier_result(INJECTION_SCORER.score(lp))
+    return {"status": "ok"}
+
+
+def detect_prompt_injection_batch(prompts: List[TextInput], rules: Optional[LDGRuleSet] = None) -> List[dict]:
+    """detect_prompt_injection for many prompts; the classifier scores all survivors in one call."""
+    rules = rules or RULE_STORE.current()
+    normalized = [analyze(prompt).normalized for prompt in prompts]
+    results: List[Optional[dict]] = [_injection_regex_check(lp, rules) for lp in normalized]
+    pending = [i for i, r in enumerate(results) if r is None]
+    if INJECTION_SCORER is not None and pending:
+        scores = INJECTION_SCORER.score_batch([normalized[i] for i in pending])
+        for i, score in zip(pending, scores):
+            results[i] = _classifier_result(float(score))
+    return [r or {"status": "ok"} for r in results]
+
+
+def detect_malicious_patterns(prompt: TextInput) -> dict:
+    """Pre-filter applied to /auth/intent prompts before they reach the LLM."""
+    lp = analyze(prompt).normalized
+    try:
+        for pattern in MALICIOUS_PREFILTER:
+            if pattern.search(lp):
+                return {"status": "blocked", "pattern": pattern.pattern,
+                        "reason": f"Prompt rejected by security filter due to potential injection: {pattern.pattern}"}
+    except PatternBudgetExceeded:
+        return {"status": "blocked", "pattern": None, "reason": BUDGET_EXCEEDED_REASON}
+    if INJECTION_SCORER is not None:
+        result = _classifier_result(INJECTION_SCORER.score(lp))
+        if result["status"] == "blocked":
+            return {**result, "pattern": None,
+                    "reason": f"Prompt rejected by security filter due to potential injection (classifier score {result['score']:.2f})"}
     return {"status": "ok"}
 
 
 # -------------------------------
 
 # -------------------------------
-def ldg_output_check(agent_output: str) -> dict:
-    for pattern in LDG_CONFIG.get("output_patterns", []):
-        if re.search(pattern, agent_output, flags=re.IGNORECASE):
-            return {"status": "blocked", "reason": f"Output contains blocked pattern '{pattern}'"}
+def ldg_output_check(agent_output: TextInput, rules: Optional[LDGRuleSet] = None) -> dict:
+    rules = rules or RULE_STORE.current()
+    normalized = analyze(agent_output).normalized
+    try:
+        for pattern in rules.output_patterns:
+            if pattern.search(normalized):
+                return {"status": "blocked", "reason": f"Output contains blocked pattern '{pattern.pattern}'"}
+    except PatternBudgetExceeded:
+        return {"status": "blocked", "reason": BUDGET_EXCEEDED_REASON}
     return {"status": "ok"}
+
+
+class IncrementalOutputGuard:
+    """
+    Output gate for streamed agent responses.
+
+    Chunks are normalized as they arrive and checked against the output
+    patterns together with the tail of what was already released, so a match
+    split across chunk boundaries (e.g. "api_" + "key") is still caught. Only
+    the shortest suffix that could still grow into a match is held back: with
+    the `regex` package this is the start of the leftmost partial match,
+    otherwise the longest bounded pattern width. Hold-back never exceeds
+    STREAM_MAX_HOLDBACK characters.
+    """
+
+    def __init__(self, rules: Optional[LDGRuleSet] = None):
+        self.rules = rules or RULE_STORE.current()
+        self._normalizer = StreamNormalizer()
+        self._context = ""            # normalized tail of released text (for cross-chunk matches)
+        self._pending_raw = ""        # raw text not yet released
+        self._pending_norm = ""       # normalized form of _pending_raw
+        self._pending_offsets: List[int] = []
+        self._released = 0            # raw characters released so far
+        self._blocked: Optional[dict] = None
+
+        widths = [p.max_width for p in self.rules.output_patterns]
+        if any(w is None for w in widths):
+            self._holdback = STREAM_MAX_HOLDBACK
+        else:
+            self._holdback = min(STREAM_MAX_HOLDBACK, max(widths, default=1) - 1)
+
+    def feed(self, chunk: str) -> dict:
+        """Returns {"status": "ok", "emit": <safe text>} or a blocked result."""
+        if self._blocked:
+            return self._blocked
+        self._pending_raw += chunk
+        return self._check(*self._normalizer.feed(chunk), final=False)
+
+    def finish(self) -> dict:
+        """Checks and releases whatever is still held back once the stream has ended."""
+        if self._blocked:
+            return self._blocked
+        return self._check(*self._normalizer.flush(), final=True)
+
+    def _check(self, norm: str, offsets: List[int], final: bool) -> dict:
+        self._pending_norm += norm
+        self._pending_offsets.extend(offsets)
+
+        window = self._context + self._pending_norm
+        try:
+            for pattern in self.rules.output_patterns:
+                if pattern.search(window):
+                    self._blocked = {"status": "blocked", "reason": f"Output contains blocked pattern '{pattern.pattern}'"}
+                    return self._blocked
+            hold_from = len(self._pending_norm) if final else self._hold_start(window, len(self._context))
+        except PatternBudgetExceeded:
+            self._blocked = {"status": "blocked", "reason": BUDGET_EXCEEDED_REASON}
+            return self._blocked
+
+        return {"status": "ok", "emit": self._release(hold_from)}
+
+    def _hold_start(self, window: str, base: int) -> int:
+        """Index into the pending normalized text from which output must be held back."""
+        pending = len(self._pending_norm)
+        if GuardedPattern.supports_partial():
+            starts = [start for pattern in self.rules.output_patterns
+                      if (start := pattern.partial_start(window, base)) is not None]
+            hold_from = min(starts) - base if starts else pending
+        else:
+            hold_from = pending - self._holdback
+        return max(hold_from, pending - STREAM_MAX_HOLDBACK, 0)
+
+    def _release(self, hold_from: int) -> str:
+        if hold_from >= len(self._pending_norm):
+            # Raw characters the normalizer still holds back have not been checked yet.
+            cut = self._normalizer.consumed - self._released
+        else:
+            cut = self._pending_offsets[hold_from] - self._released
+
+        released = self._pending_raw[:cut]
+        self._context = (self._context + self._pending_norm[:hold_from])[-STREAM_MAX_HOLDBACK:]
+        self._pending_raw = self._pending_raw[cut:]
+        self._pending_norm = self._pending_norm[hold_from:]
+        self._pending_offsets = self._pending_offsets[hold_from:]
+        self._released += cut
+        return released
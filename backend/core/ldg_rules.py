@@ -0,0 +1,197 @@
+# ldg_rules.py
+# Versioned, hot-reloadable LDG rule sets.
+#
+# A rule set is an immutable, pre-compiled snapshot of blocked_keywords.json.
+# New rules (from a changed config file or an admin upload) are compiled on
+# the caller's / watcher's thread and only then swapped in with a single
+# attribute assignment, so requests never wait on compilation and a request
+# that grabbed a rule set keeps using that exact version until it finishes.
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from core.regex_guard import GuardedPattern, compile_patterns
+
+logger = logging.getLogger(__name__)
+
+RULE_KEYS = ("input_patterns", "prompt_injection_patterns", "output_patterns")
+
+
+def _config_digest(config: Dict[str, Any]) -> str:
+    rules = {key: config.get(key, []) for key in RULE_KEYS}
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+
+
+class LDGRuleSet:
+    """Immutable compiled snapshot of the LDG rules."""
+    __slots__ = ("version", "config", "digest", "source", "loaded_at",
+                 "input_patterns", "prompt_injection_patterns", "output_patterns")
+
+    def __init__(self, version: int, config: Dict[str, Any], source: str):
+        # Compile everything first; any UnsafePatternError leaves the store untouched.
+        self.input_patterns: List[GuardedPattern] = compile_patterns(
+            config.get("input_patterns", []), re.IGNORECASE, "input_patterns")
+        self.prompt_injection_patterns: List[GuardedPattern] = compile_patterns(
+            [p.lower() for p in config.get("prompt_injection_patterns", [])], source="prompt_injection_patterns")
+        self.output_patterns: List[GuardedPattern] = compile_patterns(
+            config.get("output_patterns", []), re.IGNORECASE, "output_patterns")
+        self.version = version
+        self.config = config
+        self.digest = _config_digest(config)
+        self.source = source
+        self.loaded_at = datetime.utcnow().isoformat() + "Z"
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "digest": self.digest[:12],
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "rule_counts": {key: len(self.config.get(key, [])) for key in RULE_KEYS},
+        }
+
+
+class LDGRuleStore:
+    """
+    Holds the active LDGRuleSet plus a bounded history for rollback, and can
+    watch the config file for changes from a background thread.
+    """
+
+    def __init__(self, path: str, max_history: int = 10):
+        self.path = path
+        self.max_history = max_history
+        self._active: Optional[LDGRuleSet] = None
+        self._history: List[LDGRuleSet] = []
+        self._write_lock = threading.Lock()
+        self._file_digest: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------------- reading ----------------
+    def current(self) -> LDGRuleSet:
+        return self._active
+
+    def history(self) -> List[Dict[str, Any]]:
+        return [rule_set.describe() for rule_set in self._history]
+
+    # ---------------- loading ----------------
+    def _read_file(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _write_file(self, config: Dict[str, Any]) -> None:
+        """Atomically replaces the config file so other workers pick up the change."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> LDGRuleSet:
+        """Initial (blocking) load at import time."""
+        config = self._read_file() or {key: [] for key in RULE_KEYS}
+        with self._write_lock:
+            self._file_digest = _config_digest(config)
+            return self._swap(LDGRuleSet(self._next_version(config), config, source="file"))
+
+    def _next_version(self, config: Dict[str, Any]) -> int:
+        """Uses the version declared in the config unless it is missing or already taken by other rules."""
+        latest = max((r.version for r in self._history), default=0)
+        declared = config.get("version")
+        if isinstance(declared, int) and not isinstance(declared, bool):
+            known = next((r for r in self._history if r.version == declared), None)
+            if known is None or known.digest == _config_digest(config):
+                return declared
+        return latest + 1
+
+    def _swap(self, rule_set: LDGRuleSet) -> LDGRuleSet:
+        self._active = rule_set
+        self._history = [r for r in self._history if r.version != rule_set.version]
+        self._history.append(rule_set)
+        del self._history[:-self.max_history]
+        logger.info("LDG rules v%s active (%s)", rule_set.version, rule_set.source)
+        return rule_set
+
+    def publish(self, rules: Dict[str, List[str]], source: str = "upload") -> LDGRuleSet:
+        """
+        Compiles and activates a new rule set (e.g. from an admin upload) and
+        persists it to the config file. Raises UnsafePatternError if any
+        pattern is rejected; the active rules stay unchanged in that case.
+        """
+        with self._write_lock:
+            config = dict(self._active.config) if self._active else {}
+            config.update({key: list(rules.get(key, [])) for key in RULE_KEYS})
+            config["version"] = max((r.version for r in self._history), default=0) + 1
+
+            rule_set = LDGRuleSet(config["version"], config, source=source)
+            self._write_file(config)
+            self._file_digest = rule_set.digest
+            return self._swap(rule_set)
+
+    def rollback(self, version: Optional[int] = None) -> LDGRuleSet:
+        """
+        Re-activates a previous rule set. By default that is the newest one with
+        a lower version than the active set, so repeated rollbacks keep going back.
+        """
+        with self._write_lock:
+            if version is None:
+                older = [r for r in self._history if r.version < self._active.version]
+                if not older:
+                    raise ValueError(f"No LDG rule version older than v{self._active.version} to roll back to.")
+                target = max(older, key=lambda r: r.version)
+            else:
+                target = next((r for r in self._history if r.version == version), None)
+                if target is None:
+                    raise ValueError(f"LDG rule version {version} is not in the rollback history.")
+
+            self._write_file({**target.config, "version": target.version})
+            self._file_digest = target.digest
+            self._active = target
+            logger.info("LDG rules rolled back to v%s", target.version)
+            return target
+
+    def reload_if_changed(self) -> Optional[LDGRuleSet]:
+        """Reloads the config file if its rules changed. Returns the new rule set, if any."""
+        try:
+            config = self._read_file()
+        except (OSError, ValueError) as e:
+            logger.error("LDG rules file unreadable, keeping v%s: %s", self._active.version, e)
+            return None
+        if config is None or _config_digest(config) == self._file_digest:
+            return None
+
+        try:
+            rule_set = LDGRuleSet(0, config, source="file")
+        except ValueError as e:
+            logger.error("LDG rules file rejected, keeping v%s: %s", self._active.version, e)
+            self._file_digest = _config_digest(config)
+            return None
+
+        with self._write_lock:
+            rule_set.version = self._next_version(config)
+            self._file_digest = rule_set.digest
+            return self._swap(rule_set)
+
+    # ---------------- watching ----------------
+    def start_watcher(self, interval: float = 5.0) -> None:
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=_run, name="ldg-rule-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join(timeout=1.0)
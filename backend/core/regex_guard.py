@@ -0,0 +1,319 @@
+# regex_guard.py
+# Load-time ReDoS analysis and runtime time budgets for LDG filter patterns.
+#
+# Filter patterns come from config files and run on untrusted prompts, so a
+# single pattern with catastrophic backtracking could stall a worker. Patterns
+# are analyzed when they are compiled:
+#   - "exponential" issues (nested unbounded quantifiers, overlapping
+#     alternatives under a quantifier) are rejected in REGEX_GUARD_MODE=reject
+#     (the default) and only logged in REGEX_GUARD_MODE=flag.
+#   - "polynomial" issues (adjacent unbounded quantifiers over overlapping
+#     characters) are always logged and kept.
+# At runtime every search is bounded by LDG_MATCH_BUDGET_MS when the optional
+# `regex` package is installed (it supports match timeouts). Without it, the
+# stdlib `re` engine cannot be interrupted: over-budget matches fail closed
+# after the fact, and in reject mode every flagged pattern (polynomial ones
+# included) is rejected, since nothing would bound it.
+import logging
+import os
+import re
+import string
+import time
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse  # type: ignore
+    import sre_constants  # type: ignore
+
+try:
+    import regex as _regex
+except ImportError:
+    _regex = None
+
+logger = logging.getLogger(__name__)
+
+REGEX_GUARD_MODE = os.getenv("REGEX_GUARD_MODE", "reject")
+MATCH_TIME_BUDGET_MS = float(os.getenv("LDG_MATCH_BUDGET_MS", "50"))
+
+if _regex is None:
+    logger.warning(
+        "The 'regex' package is not installed: LDG_MATCH_BUDGET_MS (%g ms) cannot interrupt a running match; "
+        "over-budget matches are only rejected after they finish.", MATCH_TIME_BUDGET_MS,
+    )
+MAX_PATTERN_LENGTH = 1000
+
+MAXREPEAT = sre_constants.MAXREPEAT
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    _POSSESSIVE = {sre_constants.POSSESSIVE_REPEAT}
+else:
+    _POSSESSIVE = set()
+
+# Character universe used to approximate "which characters can this match".
+_ALPHABET: FrozenSet[str] = frozenset(chr(c) for c in range(256))
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: frozenset(string.digits),
+    sre_constants.CATEGORY_WORD: frozenset(string.ascii_letters + string.digits + "_"),
+    sre_constants.CATEGORY_SPACE: frozenset(" \t\n\r\f\v"),
+}
+_CATEGORIES[sre_constants.CATEGORY_NOT_DIGIT] = _ALPHABET - _CATEGORIES[sre_constants.CATEGORY_DIGIT]
+_CATEGORIES[sre_constants.CATEGORY_NOT_WORD] = _ALPHABET - _CATEGORIES[sre_constants.CATEGORY_WORD]
+_CATEGORIES[sre_constants.CATEGORY_NOT_SPACE] = _ALPHABET - _CATEGORIES[sre_constants.CATEGORY_SPACE]
+
+
+class UnsafePatternError(ValueError):
+    """Raised when a pattern is rejected by the ReDoS analyzer."""
+
+
+class PatternBudgetExceeded(RuntimeError):
+    """Raised when a single search runs past MATCH_TIME_BUDGET_MS."""
+
+    def __init__(self, pattern: str):
+        super().__init__(f"Pattern '{pattern}' exceeded the {MATCH_TIME_BUDGET_MS:g} ms match budget")
+        self.pattern = pattern
+
+
+# --------------------------------------------------------------------
+# Static analysis
+# --------------------------------------------------------------------
+def _first_chars(items) -> FrozenSet[str]:
+    """Approximate set of characters a (sub)pattern can start with."""
+    chars = set()
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            chars.add(chr(av))
+        elif op == sre_constants.NOT_LITERAL:
+            chars |= _ALPHABET - {chr(av)}
+        elif op == sre_constants.ANY:
+            chars |= _ALPHABET
+        elif op == sre_constants.IN:
+            chars |= _class_chars(av)
+        elif op == sre_constants.SUBPATTERN:
+            chars |= _first_chars(av[-1])
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                chars |= _first_chars(branch)
+        elif op in _REPEATS or op in _POSSESSIVE:
+            chars |= _first_chars(av[2])
+            if av[0] > 0:
+                return frozenset(chars)
+            continue
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            continue
+        else:
+            chars |= _ALPHABET
+        return frozenset(chars)
+    return frozenset(chars)
+
+
+def _class_chars(items) -> FrozenSet[str]:
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            chars.add(chr(av))
+        elif op == sre_constants.RANGE:
+            chars |= {chr(c) for c in range(av[0], min(av[1], 255) + 1)}
+        elif op == sre_constants.CATEGORY:
+            chars |= _CATEGORIES.get(av, _ALPHABET)
+    return frozenset(_ALPHABET - chars) if negate else frozenset(chars)
+
+
+def _contains_unbounded_repeat(items) -> bool:
+    for op, av in items:
+        if op in _REPEATS and av[1] == MAXREPEAT:
+            return True
+        if op in _REPEATS or op in _POSSESSIVE:
+            if _contains_unbounded_repeat(av[2]):
+                return True
+        elif op == sre_constants.SUBPATTERN and _contains_unbounded_repeat(av[-1]):
+            return True
+        elif op == sre_constants.BRANCH and any(_contains_unbounded_repeat(b) for b in av[1]):
+            return True
+    return False
+
+
+def _overlapping_branches(items) -> bool:
+    """True if the body is an alternation whose branches can start with the same character."""
+    for op, av in items:
+        if op == sre_constants.SUBPATTERN:
+            return _overlapping_branches(av[-1])
+        if op == sre_constants.BRANCH:
+            seen = set()
+            for branch in av[1]:
+                first = _first_chars(branch)
+                if seen & first:
+                    return True
+                seen |= first
+    return False
+
+
+def _is_nullable(op, av) -> bool:
+    if op in _REPEATS or op in _POSSESSIVE:
+        return av[0] == 0
+    if op == sre_constants.BRANCH:
+        return any(len(branch) == 0 for branch in av[1])
+    return False
+
+
+def _ambiguous_tail(items) -> bool:
+    """
+    True if the body ends in an optional element that can start with the same
+    character as the body itself, e.g. (a|aa)+ which parses as (a(?:|a))+.
+    """
+    body = list(items)
+    while len(body) == 1 and body[0][0] == sre_constants.SUBPATTERN:
+        body = list(body[0][1][-1])
+    if len(body) < 2:
+        return False
+    op, av = body[-1]
+    if not _is_nullable(op, av):
+        return False
+    tail = _first_chars(av[2]) if op in _REPEATS or op in _POSSESSIVE else _first_chars([(op, av)])
+    return bool(tail & _first_chars(body))
+
+
+def _walk(items, issues: List[Tuple[str, str]]) -> None:
+    previous_unbounded: Optional[FrozenSet[str]] = None
+    for op, av in items:
+        if op in _REPEATS:
+            low, high, body = av
+            if high == MAXREPEAT:
+                if _contains_unbounded_repeat(body):
+                    issues.append(("exponential", "nested unbounded quantifier"))
+                elif _overlapping_branches(body) or _ambiguous_tail(body):
+                    issues.append(("exponential", "overlapping alternatives under an unbounded quantifier"))
+
+                first = _first_chars(body)
+                if previous_unbounded is not None and previous_unbounded & first:
+                    issues.append(("polynomial", "adjacent unbounded quantifiers over overlapping characters"))
+                previous_unbounded = first
+            else:
+                previous_unbounded = None
+            _walk(body, issues)
+            continue
+
+        previous_unbounded = None
+        if op in _POSSESSIVE:
+            _walk(av[2], issues)
+        elif op == sre_constants.SUBPATTERN:
+            _walk(av[-1], issues)
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, issues)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], issues)
+
+
+def analyze_pattern(pattern: str, flags: int = 0) -> List[Tuple[str, str]]:
+    """
+    Returns a list of (severity, description) issues for the pattern.
+    Severity is "exponential", "polynomial" or "invalid".
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return [("invalid", f"pattern longer than {MAX_PATTERN_LENGTH} characters")]
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error as e:
+        return [("invalid", f"does not compile: {e}")]
+
+    issues: List[Tuple[str, str]] = []
+    _walk(list(parsed), issues)
+    # Keep the first occurrence of each issue only.
+    return list(dict.fromkeys(issues))
+
+
+# --------------------------------------------------------------------
+# Guarded compilation and matching
+# --------------------------------------------------------------------
+class GuardedPattern:
+    """A compiled filter pattern whose searches are bounded by the match budget."""
+    __slots__ = ("pattern", "flags", "issues", "max_width", "_compiled", "_timeout")
+
+    def __init__(self, pattern: str, flags: int = 0, issues: Optional[List[Tuple[str, str]]] = None):
+        self.pattern = pattern
+        self.flags = flags
+        self.issues = issues or []
+        # Longest possible match, or None if the pattern is unbounded.
+        width = sre_parse.parse(pattern, flags).getwidth()[1]
+        self.max_width = width if width < MAXREPEAT else None
+        self._timeout = MATCH_TIME_BUDGET_MS / 1000.0
+        self._compiled = _regex.compile(pattern, flags) if _regex is not None else re.compile(pattern, flags)
+
+    def search(self, text: str, pos: int = 0):
+        if _regex is not None:
+            try:
+                return self._compiled.search(text, pos, timeout=self._timeout)
+            except TimeoutError:
+                raise PatternBudgetExceeded(self.pattern)
+
+        start = time.perf_counter()
+        match = self._compiled.search(text, pos)
+        self._check_elapsed(start)
+        return match
+
+    def _check_elapsed(self, start: float) -> None:
+        """The stdlib engine cannot be interrupted; fail closed after the fact."""
+        elapsed = time.perf_counter() - start
+        if elapsed > self._timeout:
+            logger.warning("LDG pattern '%s' took %.1f ms (budget %g ms)", self.pattern, elapsed * 1000, MATCH_TIME_BUDGET_MS)
+            raise PatternBudgetExceeded(self.pattern)
+
+    def partial_start(self, text: str, pos: int = 0) -> Optional[int]:
+        """
+        Start of the leftmost match that runs into the end of `text` and could
+        still complete if more text arrived, or None. Needs the `regex`
+        package; callers fall back to max_width without it.
+        """
+        if _regex is None:
+            return None
+        try:
+            match = self._compiled.search(text, pos, partial=True, timeout=self._timeout)
+        except TimeoutError:
+            raise PatternBudgetExceeded(self.pattern)
+        if match is None or not match.partial or match.start() == len(text):
+            return None
+        return match.start()
+
+    @staticmethod
+    def supports_partial() -> bool:
+        return _regex is not None
+
+    def sub(self, repl: str, text: str) -> str:
+        if _regex is not None:
+            try:
+                return self._compiled.sub(repl, text, timeout=self._timeout)
+            except TimeoutError:
+                raise PatternBudgetExceeded(self.pattern)
+        start = time.perf_counter()
+        result = self._compiled.sub(repl, text)
+        self._check_elapsed(start)
+        return result
+
+    def __repr__(self) -> str:
+        return f"GuardedPattern({self.pattern!r})"
+
+
+def compile_pattern(pattern: str, flags: int = 0, source: str = "pattern") -> GuardedPattern:
+    """
+    Analyzes and compiles a single pattern. Raises UnsafePatternError for
+    invalid patterns, and for super-linear ones in reject mode (exponential
+    ones only, unless the `regex` package is missing and no timeout applies).
+    """
+    issues = analyze_pattern(pattern, flags)
+    for severity, description in issues:
+        if severity == "invalid":
+            raise UnsafePatternError(f"{source}: pattern '{pattern}' rejected ({description})")
+        if REGEX_GUARD_MODE == "reject" and (severity == "exponential" or _regex is None):
+            raise UnsafePatternError(f"{source}: pattern '{pattern}' rejected ({description})")
+        logger.warning("%s: pattern '%s' flagged as %s (%s)", source, pattern, severity, description)
+    return GuardedPattern(pattern, flags, issues)
+
+
+def compile_patterns(patterns: Iterable[str], flags: int = 0, source: str = "patterns") -> List[GuardedPattern]:
+    return [compile_pattern(p, flags, source) for p in patterns]
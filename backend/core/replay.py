@@ -0,0 +1,158 @@
+# replay.py
+# One-time-use enforcement for agent delegation tokens.
+#
+# Every agent token carries a random `jti`. The first request that presents it
+# records the jti until the token's `exp`; any later request with the same jti
+# is a replay. Entries never outlive their token, so the store holds at most
+# (issuance rate x token lifetime) entries and REPLAY_MAX_ENTRIES caps that.
+#
+# The in-memory store is a hashed timing wheel: one slot per
+# REPLAY_BUCKET_SECONDS of expiry time. Insert and lookup are O(1) dict
+# operations, and advancing the wheel drops a whole slot of expired jtis at once
+# instead of scanning entries. REPLAY_STORE_BACKEND=sqlite shares the state
+# between several local worker processes through a small SQLite file.
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+REPLAY_STORE_BACKEND = os.getenv("REPLAY_STORE_BACKEND", "memory")
+REPLAY_DB_PATH = os.getenv("REPLAY_DB_PATH", "replay.db")
+REPLAY_BUCKET_SECONDS = float(os.getenv("REPLAY_BUCKET_SECONDS", "1"))
+# Longest token lifetime the wheel covers (agent tokens live 2 minutes).
+REPLAY_MAX_TTL_SECONDS = float(os.getenv("REPLAY_MAX_TTL_SECONDS", "300"))
+REPLAY_MAX_ENTRIES = int(os.getenv("REPLAY_MAX_ENTRIES", "1000000"))
+
+
+class ReplayStoreFull(RuntimeError):
+    """Raised when recording a jti would exceed REPLAY_MAX_ENTRIES."""
+
+
+class ExpiringReplayStore:
+    """In-memory jti store built on a hashed timing wheel."""
+
+    # O(1) and in-memory: safe to call directly from the event loop.
+    blocking = False
+
+    def __init__(self, bucket_seconds: float = REPLAY_BUCKET_SECONDS, max_ttl: float = REPLAY_MAX_TTL_SECONDS,
+                 max_entries: int = REPLAY_MAX_ENTRIES):
+        self.bucket_seconds = bucket_seconds
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self._slots: List[Set[bytes]] = [set() for _ in range(int(math.ceil(max_ttl / bucket_seconds)) + 2)]
+        self._seen: Dict[bytes, int] = {}  # jti -> expiry tick
+        self._tick = int(time.time() // bucket_seconds)
+        self._lock = threading.Lock()
+
+    def _advance(self, now_tick: int) -> None:
+        # Clear every slot whose tick has passed; at most one full turn of the wheel.
+        for tick in range(self._tick, min(now_tick, self._tick + len(self._slots))):
+            slot = self._slots[tick % len(self._slots)]
+            for jti in slot:
+                self._seen.pop(jti, None)
+            slot.clear()
+        if now_tick - self._tick >= len(self._slots):
+            self._seen.clear()
+        self._tick = max(self._tick, now_tick)
+
+    def check_and_record(self, jti: str, exp: float) -> bool:
+        """Records jti until exp. Returns False if it was already recorded (a replay)."""
+        now = time.time()
+        if exp - now > self.max_ttl:
+            raise ValueError("Token lifetime exceeds the replay window.")
+        key = _compact(jti)
+        # Keep the entry until the end of the tick in which the token expires.
+        exp_tick = int(exp // self.bucket_seconds) + 1
+        with self._lock:
+            self._advance(int(now // self.bucket_seconds))
+            if key in self._seen:
+                return False
+            if len(self._seen) >= self.max_entries:
+                raise ReplayStoreFull("Replay store is full.")
+            self._seen[key] = exp_tick
+            self._slots[exp_tick % len(self._slots)].add(key)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class SQLiteReplayStore:
+    """jti store in a SQLite file, shared by all workers on the host."""
+
+    # Does file I/O and may wait on the SQLite lock: callers run it off the event loop.
+    blocking = True
+
+    def __init__(self, path: str = REPLAY_DB_PATH, max_entries: int = REPLAY_MAX_ENTRIES,
+                 purge_interval: float = REPLAY_BUCKET_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        # Guards the purge schedule and the entry count, which are shared by the calling threads.
+        self._state_lock = threading.Lock()
+        self._next_purge = 0.0
+        # Entry count as of the last purge plus inserts since; avoids a COUNT(*) per request.
+        self._approx_entries = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS replay (jti BLOB PRIMARY KEY, exp REAL NOT NULL) WITHOUT ROWID")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_replay_exp ON replay (exp)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Per thread and per process: a connection must not be shared across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.pid = os.getpid()
+        return conn
+
+    def check_and_record(self, jti: str, exp: float) -> bool:
+        conn = self._conn()
+        now = time.time()
+        with self._state_lock:
+            purge = now >= self._next_purge
+            if purge:
+                self._next_purge = now + self.purge_interval
+        if purge:
+            # Bulk-evict everything that has expired, using the exp index.
+            conn.execute("DELETE FROM replay WHERE exp < ?", (now,))
+            count = conn.execute("SELECT COUNT(*) FROM replay").fetchone()[0]
+            with self._state_lock:
+                self._approx_entries = count
+        if self._approx_entries >= self.max_entries:
+            raise ReplayStoreFull("Replay store is full.")
+        # The exp guard treats a leftover entry of an expired token as free.
+        cursor = conn.execute(
+            "INSERT INTO replay (jti, exp) VALUES (?, ?) "
+            "ON CONFLICT(jti) DO UPDATE SET exp = excluded.exp WHERE replay.exp < ?",
+            (_compact(jti), exp, now),
+        )
+        if cursor.rowcount == 0:
+            return False
+        with self._state_lock:
+            self._approx_entries += 1
+        return True
+
+
+def _compact(jti: str) -> bytes:
+    """uuid4 hex jtis are stored as 16 raw bytes; anything else as UTF-8."""
+    try:
+        return bytes.fromhex(jti) if len(jti) == 32 else jti.encode()
+    except ValueError:
+        return jti.encode()
+
+
+def create_replay_store(backend: Optional[str] = None):
+    backend = backend or REPLAY_STORE_BACKEND
+    if backend == "sqlite":
+        return SQLiteReplayStore()
+    if backend == "memory":
+        return ExpiringReplayStore()
+    raise ValueError(f"Unknown REPLAY_STORE_BACKEND '{backend}' (expected 'memory' or 'sqlite').")
+
+
+REPLAY_STORE = create_replay_store()
@@ -0,0 +1,168 @@
+# retention.py
+# Tiered retention for the audit ledger.
+#
+# The hot tier is the audit table in acl.db. AuditArchiver periodically moves
+# the oldest events, those older than AUDIT_RETENTION_DAYS, into immutable
+# archive segments (core/audit_archive.py) and deletes them from acl.db, so
+# the hot table and its indexes stay small. Only a contiguous prefix of IDs
+# is moved. Each segment is committed to disk before the rows are deleted. If
+# a run is interrupted in between, the next run first deletes the hot copies
+# of rows that are already archived. acl.get_event falls back to the archive,
+# and the audit_stats counters are kept, so dashboards still cover archived
+# events.
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from core import acl
+from core.audit_archive import AUDIT_ARCHIVE, AuditArchive
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one process may run the archiver
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Events older than this many days are archived; 0 disables the background archiver.
+AUDIT_RETENTION_DAYS = float(os.getenv("AUDIT_RETENTION_DAYS", "30"))
+AUDIT_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("AUDIT_ARCHIVE_INTERVAL_SECONDS", "3600"))
+AUDIT_ARCHIVE_SEGMENT_ROWS = int(os.getenv("AUDIT_ARCHIVE_SEGMENT_ROWS", "50000"))
+
+
+class AuditArchiver:
+    """Moves events past the retention threshold from acl.db into archive segments."""
+
+    def __init__(self, archive: AuditArchive = AUDIT_ARCHIVE, retention_days: float = AUDIT_RETENTION_DAYS,
+                 interval_seconds: float = AUDIT_ARCHIVE_INTERVAL_SECONDS,
+                 segment_rows: int = AUDIT_ARCHIVE_SEGMENT_ROWS):
+        self.archive = archive
+        self.retention_days = retention_days
+        self.interval_seconds = interval_seconds
+        self.segment_rows = segment_rows
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+
+    def cutoff(self) -> str:
+        """Timestamps below this (same ISO format as acl.log_events) are archived."""
+        return (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat() + "Z"
+
+    def _drop_archived(self, conn: sqlite3.Connection, archived_up_to: int) -> int:
+        """Deletes the hot copies (and blind-index rows) of events that are already archived."""
+        conn.execute("DELETE FROM audit_index WHERE event_id <= ?", (archived_up_to,))
+        deleted = conn.execute("DELETE FROM audit WHERE id <= ?", (archived_up_to,)).rowcount
+        conn.commit()
+        return deleted
+
+    def _archive_locked(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        cutoff = self.cutoff()
+        archived_up_to = self.archive.last_archived_id()
+        self._drop_archived(conn, archived_up_to)
+        moved, segments = 0, 0
+        while not self._stop.is_set():
+            rows = conn.execute(
+                f"SELECT {acl._EVENT_COLUMNS} FROM audit WHERE id > ? ORDER BY id LIMIT ?",
+                (archived_up_to, self.segment_rows),
+            ).fetchall()
+            # Stop at the first event that is still within retention, so segments never skip a hot row.
+            expired = 0
+            while expired < len(rows) and rows[expired][1] < cutoff:
+                expired += 1
+            if not expired:
+                break
+            _, archived_up_to = self.archive.append(rows[:expired])
+            moved += self._drop_archived(conn, archived_up_to)
+            segments += 1
+            if expired < len(rows):
+                break
+        return {"cutoff": cutoff, "archived_rows": moved, "segments_written": segments,
+                "archived_up_to": archived_up_to, "finished_at": datetime.utcnow().isoformat() + "Z"}
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """
+        Archives everything past the cutoff. Returns a summary, or None if another
+        process (e.g. another pre-forked worker) is archiving right now.
+        """
+        os.makedirs(self.archive.directory, exist_ok=True)
+        with self._run_lock, open(os.path.join(self.archive.directory, ".archiver.lock"), "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            conn = sqlite3.connect(acl.DB_PATH, timeout=30)
+            try:
+                self.last_run = self._archive_locked(conn)
+                self.error = None
+            except Exception as e:
+                conn.rollback()
+                self.error = str(e)
+                logger.error("Audit archiving failed: %s", e)
+                raise
+            finally:
+                conn.close()
+        if self.last_run["archived_rows"]:
+            logger.info("Archived %s audit events up to ID %s", self.last_run["archived_rows"],
+                        self.last_run["archived_up_to"])
+        return self.last_run
+
+    def status(self) -> Dict[str, Any]:
+        conn = sqlite3.connect(acl.DB_PATH)
+        try:
+            hot_rows = conn.execute("SELECT COUNT(*) FROM audit").fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            "retention_days": self.retention_days,
+            "interval_seconds": self.interval_seconds,
+            "running": self.is_running(),
+            "hot_rows": hot_rows,
+            "archive": self.archive.status(),
+            "last_run": self.last_run,
+            "error": self.error,
+        }
+
+    # ---------------- background ----------------
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Archives now and then every interval_seconds on a background thread."""
+        if self.is_running():
+            return False
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception:
+                    pass  # recorded in self.error; retried next interval
+                self._stop.wait(self.interval_seconds)
+
+        self._thread = threading.Thread(target=_run, name="audit-archiver", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+
+# Process-wide archiver started by main.lifespan (unless AUDIT_RETENTION_DAYS is 0).
+AUDIT_ARCHIVER = AuditArchiver()
+
+
+if __name__ == "__main__":
+    import sys
+
+    acl.init_db()
+    days = float(sys.argv[1]) if len(sys.argv) > 1 else AUDIT_RETENTION_DAYS
+    print(AuditArchiver(retention_days=days).run_once())
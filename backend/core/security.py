@@ -1,4 +1,5 @@
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
@@ -19,15 +20,20 @@ class AuthHandler:
 
     def encode_token(self, username: str, roles: str, is_agent_token: bool = False) -> str:
         expiry_minutes = 2 if is_agent_token else settings.JWT_EXPIRY_MINUTES
-        expire = datetime.now() + timedelta(minutes=expiry_minutes)
+        # Timezone-aware: naive local times would be read as UTC by jose.
+        now = datetime.now(timezone.utc)
+        expire = now + timedelta(minutes=expiry_minutes)
 
         payload = {
             "sub": username,
             "roles": roles.split(","),
             "exp": expire,
-            "iat": datetime.now(),
+            "iat": now,
             "auth": settings.SERVER_ID,
         }
+        if is_agent_token:
+            # Unique token ID; the execution service accepts each agent token once.
+            payload["jti"] = uuid.uuid4().hex
         return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
     def decode_token(self, token: str):
@@ -0,0 +1,152 @@
+# text_analysis.py
+# Shared per-request text analysis.
+#
+# One AnalysisContext is created per text (prompt, delegated input or agent
+# response) and handed to every LDG filter. It normalizes the text once and
+# computes the expensive artifacts (the spaCy doc) lazily, so the
+# filters stop re-lowering, re-scanning and re-tokenizing the same string.
+#
+# Normalization also closes cheap evasion tricks: NFKC folds full-width and
+# compatibility characters, zero-width characters are dropped, common
+# Cyrillic/Greek homoglyphs map to their Latin look-alikes, case is folded and
+# runs of whitespace collapse to a single space.
+import re
+import unicodedata
+from typing import Any, List, Optional, Tuple
+
+_ZERO_WIDTH = "\u00ad\u180e\u200b\u200c\u200d\u2060\ufeff"
+
+# Non-Latin characters that render like Latin letters, mapped to the letter they imitate.
+_HOMOGLYPHS = {
+    # Cyrillic
+    "\u0430": "a", "\u0432": "b", "\u0435": "e", "\u043a": "k", "\u043c": "m", "\u043d": "h",
+    "\u043e": "o", "\u0440": "p", "\u0441": "c", "\u0442": "t", "\u0443": "y", "\u0445": "x",
+    "\u0456": "i", "\u0458": "j", "\u0455": "s", "\u0501": "d", "\u051b": "q", "\u051d": "w",
+    "\u04cf": "l", "\u0410": "A", "\u0412": "B", "\u0415": "E", "\u041a": "K", "\u041c": "M",
+    "\u041d": "H", "\u041e": "O", "\u0420": "P", "\u0421": "C", "\u0422": "T", "\u0423": "Y",
+    "\u0425": "X", "\u0406": "I", "\u0408": "J", "\u0405": "S",
+    # Greek
+    "\u03b1": "a", "\u03b5": "e", "\u03b9": "i", "\u03ba": "k", "\u03bd": "v", "\u03bf": "o",
+    "\u03c1": "p", "\u03c4": "t", "\u03c5": "u", "\u03c7": "x", "\u0391": "A", "\u0392": "B",
+    "\u0395": "E", "\u0396": "Z", "\u0397": "H", "\u0399": "I", "\u039a": "K", "\u039c": "M",
+    "\u039d": "N", "\u039f": "O", "\u03a1": "P", "\u03a4": "T", "\u03a5": "Y", "\u03a7": "X",
+}
+_TRANSLATION = str.maketrans({**_HOMOGLYPHS, **{ch: None for ch in _ZERO_WIDTH}})
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC + zero-width removal + homoglyph folding + casefold + whitespace collapse."""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.translate(_TRANSLATION).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class AnalysisContext:
+    """
+    Holds a text together with its normalized form and lazily computed
+    analysis artifacts. Filters should read `normalized` for matching and
+    `text` when they need to transform the original (e.g. PII masking).
+    """
+    __slots__ = ("text", "_nlp", "_normalized", "_doc")
+
+    def __init__(self, text: str, nlp: Any = None):
+        self.text = text
+        self._nlp = nlp
+        self._normalized: Optional[str] = None
+        self._doc: Any = None
+
+    @property
+    def normalized(self) -> str:
+        if self._normalized is None:
+            self._normalized = normalize_text(self.text)
+        return self._normalized
+
+    @property
+    def doc(self):
+        """spaCy doc of the original text, or None if no model is loaded."""
+        if self._doc is None and self._nlp is not None:
+            self._doc = self._nlp(self.text)
+        return self._doc
+
+    def set_doc(self, doc) -> None:
+        """Attach a doc produced elsewhere (e.g. by a batched nlp.pipe call)."""
+        self._doc = doc
+
+
+# UAX #15 stream-safe text has at most 30 non-starters in a row; a longer run is cut.
+_MAX_HELD = 32
+
+
+def _composes_across(text: str, i: int) -> bool:
+    """True if text[i] may still combine with what precedes it under NFKC."""
+    ch = text[i]
+    if ch.isascii():
+        return False  # no composition ends in an ASCII character
+    if unicodedata.combining(ch) or "\u1160" <= ch <= "\u11ff" or "\ud7b0" <= ch <= "\ud7ff":
+        return True  # combining mark, or a Hangul vowel/final jamo that joins the syllable before it
+    prev = text[i - 1]
+    return unicodedata.normalize("NFKC", prev + ch) != unicodedata.normalize("NFKC", prev) + unicodedata.normalize("NFKC", ch)
+
+
+def _normalize_segment(segment: str) -> str:
+    if not segment.isascii():
+        segment = unicodedata.normalize("NFKC", segment)
+    return segment.translate(_TRANSLATION).casefold()
+
+
+class StreamNormalizer:
+    """
+    Incremental version of normalize_text for streamed text. Returns the
+    normalized characters of each chunk together with, for every normalized
+    character, the offset of the raw character it came from. Leading and
+    trailing whitespace is collapsed but not stripped.
+
+    NFKC composes a character with the combining marks that follow it, so the
+    last character of a chunk and its marks are held back until a character
+    arrives that cannot attach to them (or until flush()). Text is normalized
+    in segments that do not compose with each other, which gives the same
+    result as normalizing the whole string. `consumed` is the number of raw
+    characters normalized so far.
+    """
+    __slots__ = ("consumed", "_held", "_last_was_space")
+
+    def __init__(self):
+        self.consumed = 0
+        self._held = ""
+        self._last_was_space = False
+
+    def feed(self, chunk: str) -> Tuple[str, List[int]]:
+        text = self._held + chunk
+        cut = len(text) - 1
+        while cut > 0 and _composes_across(text, cut):
+            cut -= 1
+        if len(text) - cut > _MAX_HELD:
+            cut = len(text)
+        return self._emit(text, max(cut, 0))
+
+    def flush(self) -> Tuple[str, List[int]]:
+        """Normalizes the held-back tail once the stream has ended."""
+        return self._emit(self._held, len(self._held))
+
+    def _emit(self, text: str, cut: int) -> Tuple[str, List[int]]:
+        out: List[str] = []
+        offsets: List[int] = []
+        start = 0
+        for end in range(1, cut + 1):
+            if end < cut and _composes_across(text, end):
+                continue
+            for norm_ch in _normalize_segment(text[start:end]):
+                if norm_ch.isspace():
+                    if self._last_was_space:
+                        continue
+                    norm_ch = " "
+                    self._last_was_space = True
+                else:
+                    self._last_was_space = False
+                out.append(norm_ch)
+                offsets.append(self.consumed + start)
+            start = end
+        self._held = text[cut:]
+        self.consumed += cut
+        return "".join(out), offsets
@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from db.base import Base
 from db.session import engine, get_db
-from routers import auth, employee, agent
+from routers import auth, employee, agent, admin, audit
 from db.models import Employee
 from core.security import auth_handler
 from passlib.context import CryptContext
@@ -10,7 +10,11 @@ from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 
 # NEW: Import ACL initialization function
-from core.acl import init_db # Assuming acl.py is accessible in the Python path
+from core.acl import init_db, open_async_db, close_async_db # Assuming acl.py is accessible in the Python path
+from core.executors import shutdown_executors
+from core.key_rotation import REENCRYPTION_JOB
+from core.retention import AUDIT_ARCHIVER
+from core.ldg import RULE_STORE, RELOAD_INTERVAL_SECONDS
 
 # Hardcoded data for a simple prototype.
 mock_employees = [
@@ -30,10 +34,7 @@ def create_initial_users(db: Session):
         db.commit()
         print("Database populated with initial users.")
 
-# The new lifespan event handler
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # --- STARTUP LOGIC ---
+def init_storage():
     # 1. Initialize the Encrypted Audit Ledger DB (acl.db)
     init_db()
     
@@ -46,9 +47,29 @@ async def lifespan(app: FastAPI):
         create_initial_users(db)
     finally:
         db.close()
+
+# The new lifespan event handler
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- STARTUP LOGIC ---
+    # Steps 1-3: databases and initial users (idempotent; serve.py also runs them before forking)
+    init_storage()
+    await open_async_db()
+
+    # 4. Watch blocked_keywords.json and hot-swap new LDG rule versions
+    RULE_STORE.start_watcher(RELOAD_INTERVAL_SECONDS)
+
+    # 5. Move audit events past the retention threshold into archive segments
+    if AUDIT_ARCHIVER.retention_days > 0:
+        AUDIT_ARCHIVER.start()
     
     yield
-    # --- SHUTDOWN LOGIC (None currently) ---
+    # --- SHUTDOWN LOGIC ---
+    RULE_STORE.stop_watcher()
+    REENCRYPTION_JOB.stop()
+    AUDIT_ARCHIVER.stop()
+    await close_async_db()
+    shutdown_executors()
 
 app = FastAPI(title="FinLLM Authorization Framework", lifespan=lifespan)
 
@@ -65,3 +86,5 @@ app.add_middleware(
 app.include_router(auth.router)
 app.include_router(employee.router)
 app.include_router(agent.router)
+app.include_router(admin.router)
+app.include_router(audit.router)
@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from core.acl import get_llm_usage, log_event
+from core.key_rotation import REENCRYPTION_JOB
+from core.retention import AUDIT_ARCHIVER
+from core.ldg import RULE_STORE
+from core.security import role_required
+from services.intent_service import system_instruction_for
+from schemas.admin import LDGRulesUpload, LDGRollbackRequest
+from typing import Dict, Any, Optional
+
+router = APIRouter(prefix="/admin", tags=["Administration"])
+
+admin_required = role_required(["manager"])
+
+
+def _rules_status() -> Dict[str, Any]:
+    return {
+        "active": RULE_STORE.current().describe(),
+        "history": RULE_STORE.history(),
+    }
+
+
+@router.get("/ldg/rules")
+def get_ldg_rules(current_employee: dict = Depends(admin_required)) -> Dict[str, Any]:
+    """Returns the active LDG rule version and the versions available for rollback."""
+    return {**_rules_status(), "rules": RULE_STORE.current().config}
+
+
+@router.put("/ldg/rules")
+def upload_ldg_rules(
+    request: LDGRulesUpload,
+    current_employee: dict = Depends(admin_required)
+) -> Dict[str, Any]:
+    """
+    Compiles the uploaded rules and swaps them in as a new version without a restart.
+    Rules rejected by the ReDoS guard leave the active version unchanged.
+    """
+    try:
+        rule_set = RULE_STORE.publish(request.model_dump(), source=f"upload:{current_employee.get('sub')}")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    log_event("ldg_rules_updated", {"user_sub": current_employee.get("sub"), "ldg_rules_version": rule_set.version})
+    return _rules_status()
+
+
+@router.post("/ldg/rules/rollback")
+def rollback_ldg_rules(
+    request: LDGRollbackRequest,
+    current_employee: dict = Depends(admin_required)
+) -> Dict[str, Any]:
+    """Re-activates a previous LDG rule version (the previous one if no version is given)."""
+    try:
+        rule_set = RULE_STORE.rollback(request.version)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    log_event("ldg_rules_rolled_back", {"user_sub": current_employee.get("sub"), "ldg_rules_version": rule_set.version})
+    return _rules_status()
+
+
+@router.get("/audit/reencryption")
+def get_reencryption_status(current_employee: dict = Depends(admin_required)) -> Dict[str, Any]:
+    """Progress of re-encrypting the audit ledger under the primary DB key."""
+    return REENCRYPTION_JOB.status()
+
+
+@router.post("/audit/reencryption")
+def start_reencryption(current_employee: dict = Depends(admin_required)) -> Dict[str, Any]:
+    """
+    Starts (or resumes) the throttled background re-encryption of audit rows
+    written with a previous DB key. Live requests keep running meanwhile.
+    """
+    if not REENCRYPTION_JOB.start():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Re-encryption is already running.")
+
+    log_event("acl_reencryption_started", {"user_sub": current_employee.get("sub"),
+                                           "key_version": REENCRYPTION_JOB.target_version})
+    return REENCRYPTION_JOB.status()
+
+
+@router.post("/audit/reencryption/stop")
+def stop_reencryption(current_employee: dict = Depends(admin_required)) -> Dict[str, Any]:
+    """Pauses the re-encryption job; progress is kept and a later start resumes it."""
+    REENCRYPTION_JOB.stop()
+    log_event("acl_reencryption_stopped", {"user_sub": current_employee.get("sub"),
+                                           "key_version": REENCRYPTION_JOB.target_version})
+    return REENCRYPTION_JOB.status()
+
+
+@router.get("/audit/archive")
+def get_archive_status(current_employee: dict = Depends(admin_required)) -> Dict[str, Any]:
+    """Size of the hot audit table, the archive segments and the last archiving run."""
+    return AUDIT_ARCHIVER.status()
+
+
+@router.post("/audit/archive")
+def run_archiver(current_employee: dict = Depends(admin_required)) -> Dict[str, Any]:
+    """Archives audit events past the retention threshold now instead of waiting for the next interval."""
+    try:
+        result = AUDIT_ARCHIVER.run_once()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Archiving failed: {e}")
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Archiving is already running.")
+
+    log_event("audit_archived", {"user_sub": current_employee.get("sub"), "archived_rows": result["archived_rows"],
+                                 "archived_up_to": result["archived_up_to"]})
+    return AUDIT_ARCHIVER.status()
+
+
+@router.get("/llm/usage")
+def get_llm_usage_report(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    current_employee: dict = Depends(admin_required)
+) -> Dict[str, Any]:
+    """
+    Token counts of intent-parsing LLM calls, in total and per role set, from
+    the audit ledger (so they cover every worker and survive restarts).
+    since/until are ISO hour prefixes, e.g. ?since=2025-01-31T00.
+    """
+    usage = get_llm_usage(since=since, until=until)
+    for entry in usage["by_role_set"]:
+        entry["system_instruction_chars"] = len(system_instruction_for(tuple(entry["roles"])))
+    return usage
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi.responses import StreamingResponse
 from services.execution_service import ExecutionService
-from schemas.employee import ActionRequest
+from schemas.employee import ActionRequest, BatchActionRequest
 from typing import Annotated, Dict, Any
 
 # NOTE: The prefix is intentionally different from /employee to signify 
@@ -8,8 +9,14 @@ from typing import Annotated, Dict, Any
 # relying on the delegation token.
 router = APIRouter(prefix="/agent", tags=["Secured Agent Execution"])
 
+# One service instance per process; it holds no per-request state.
+_execution_service = ExecutionService()
+
+def get_execution_service() -> ExecutionService:
+    return _execution_service
+
 # Dependency to extract the Agent Token from the Authorization header
-def get_agent_token(authorization: Annotated[str, Header()]):
+async def get_agent_token(authorization: Annotated[str, Header()]):
     """
     Extracts the Agent Token (Delegation Token) from the Authorization header.
     It expects the format: Authorization: Bearer <token>
@@ -23,11 +30,12 @@ def get_agent_token(authorization: Annotated[str, Header()]):
 
 
 @router.post("/execute")
-def execute_agent_action(
+async def execute_agent_action(
     request: ActionRequest,
     agent_token: str = Depends(get_agent_token),
-    execution_service: ExecutionService = Depends()
-) -> Dict[str, Any]:
+    execution_service: ExecutionService = Depends(get_execution_service),
+    stream: bool = False
+) -> Any:
     """
     Endpoint that receives the delegated request and runs the full security pipeline.
 
@@ -38,12 +46,22 @@ def execute_agent_action(
     4. Cryptographic Message Signing (ATV).
     5. Output Sanitization (LDG).
     6. Event Logging (ACL).
+
+    With ?stream=true the agent response is sent as Server-Sent Events
+    (chunk / blocked / done) and checked incrementally by the output gate.
     """
     
     # The ActionRequest schema already performs Pydantic validation on the request body.
 
     try:
-        result = execution_service.execute_secured_query(
+        if stream:
+            events = await execution_service.stream_secured_query(
+                agent_token=agent_token,
+                request=request
+            )
+            return StreamingResponse(events, media_type="text/event-stream")
+
+        result = await execution_service.execute_secured_query(
             agent_token=agent_token,
             request=request
         )
@@ -56,4 +74,31 @@ def execute_agent_action(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Execution Failed: {e}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/execute-batch")
+async def execute_agent_batch(
+    request: BatchActionRequest,
+    agent_token: str = Depends(get_agent_token),
+    execution_service: ExecutionService = Depends(get_execution_service)
+) -> Dict[str, Any]:
+    """
+    Runs many delegated actions through the security pipeline in one round trip.
+
+    The Agent Token is validated once, LDG/NER runs over the whole batch, the
+    accepted items share one ATV signature (Merkle root), and all ACL events
+    are written in a single transaction. Results and errors are per item.
+    """
+    try:
+        return await execution_service.execute_secured_batch(
+            agent_token=agent_token,
+            requests=request.actions
+        )
+    except HTTPException as e:
+        raise e
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch Execution Failed: {e}"
+        )
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from core.acl import AUDIT_INDEXED_FIELDS, STATS_DIMENSIONS, find_events, get_stats, log_event
+from core.security import role_required
+from typing import Dict, Any, Optional
+
+router = APIRouter(prefix="/audit", tags=["Audit Ledger"])
+
+audit_reader_required = role_required(["audit_reader"])
+
+
+@router.get("/events")
+def search_audit_events(
+    request: Request,
+    event_type: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_employee: dict = Depends(audit_reader_required)
+) -> Dict[str, Any]:
+    """
+    Searches the encrypted audit ledger by exact payload field values, e.g.
+    /audit/events?user_sub=teller1&delegated_action=transfer.
+
+    Every query parameter other than event_type and limit is a field filter and
+    must be one of the blind-indexed fields; only matching events are decrypted.
+    """
+    filters = {k: v for k, v in request.query_params.items() if k not in ("event_type", "limit")}
+    try:
+        events = find_events(filters, event_type=event_type, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    log_event("audit_search", {"user_sub": current_employee.get("sub"), "fields": sorted(filters),
+                               "event_type": event_type, "matches": len(events)})
+    return {"indexed_fields": list(AUDIT_INDEXED_FIELDS), "count": len(events), "events": events}
+
+
+@router.get("/stats")
+def get_audit_stats(
+    group_by: str = "event_type",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    event_type: Optional[str] = None,
+    user_sub: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    current_employee: dict = Depends(audit_reader_required)
+) -> Dict[str, Any]:
+    """
+    Event counts from the incrementally maintained aggregates, e.g.
+    /audit/stats?group_by=reason&event_type=query_blocked or
+    /audit/stats?group_by=hour,action&since=2025-01-31T00.
+
+    group_by is a comma-separated list of hour, event_type, user (a hashed
+    user token), action and reason. No encrypted payload is read.
+    """
+    dimensions = [dim.strip() for dim in group_by.split(",") if dim.strip()]
+    try:
+        rows = get_stats(dimensions, since=since, until=until, event_type=event_type, user_sub=user_sub, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"group_by": dimensions, "dimensions": list(STATS_DIMENSIONS), "rows": rows}
@@ -6,8 +6,8 @@ from schemas.auth import Token, IntentRequest, IntentResponse, DelegationRequest
 from core.security import get_current_employee, auth_handler
 from typing import List
 from services.intent_service import ROLE_ACTION_MAP
-from core.malicious_patterns import MALICIOUS_PATTERNS
-import re
+from core.ldg import analyze, detect_malicious_patterns
+from core.admission import INTENT_ADMISSION, AdmissionRejected
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -26,16 +26,27 @@ async def get_user_intent(
     This serves as the User Intent Confirmation (UIC) component.
     """
     # --- NEW SECURITY LAYER: Prompt Injection Pre-filter ---
-    for category, patterns in MALICIOUS_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, request.prompt.lower()):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Prompt rejected by security filter due to potential injection: {pattern}"
-                )
+    prompt_ctx = analyze(request.prompt)
+    prefilter_result = detect_malicious_patterns(prompt_ctx)
+    if prefilter_result["status"] == "blocked":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=prefilter_result["reason"]
+        )
 
     user_roles = current_employee_payload.get("roles", [])
-    return await intent_service.get_intent_from_prompt(request.prompt, user_roles)
+
+    # --- Admission control: per-user/role rate limits and the LLM concurrency gate ---
+    try:
+        async with INTENT_ADMISSION.admit(current_employee_payload.get("sub"), user_roles):
+            return await intent_service.get_intent_from_prompt(
+                request.prompt, user_roles, current_employee_payload.get("sub"))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
 
 @router.post("/delegate", response_model=DelegationResponse)
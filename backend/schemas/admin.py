@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class LDGRulesUpload(BaseModel):
+    input_patterns: List[str] = []
+    prompt_injection_patterns: List[str] = []
+    output_patterns: List[str] = []
+
+class LDGRollbackRequest(BaseModel):
+    version: Optional[int] = None
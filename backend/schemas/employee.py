@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 class User(BaseModel):
     username: str
@@ -7,3 +8,6 @@ class ActionRequest(BaseModel):
     action: str
     account_id: str
     amount: int
+
+class BatchActionRequest(BaseModel):
+    actions: List[ActionRequest]
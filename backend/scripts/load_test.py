@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the login -> /auth/intent -> /auth/delegate -> /agent/execute flow.
+
+By default everything runs offline and in-process: a mock LLM server is started
+on a local port, the backend is configured with LLM_BACKEND=mock, and requests
+are driven against main.app through httpx's ASGI transport inside a scratch
+working directory (so the real fin_llm.db / acl.db are not touched).
+
+    python scripts/load_test.py --users 20 --duration 30 --latency lognormal:300,0.4
+
+Use --base-url to drive an already running server instead (start it with
+LLM_BACKEND=mock and MOCK_LLM_URL pointing at scripts/mock_llm_server.py).
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "scripts"))
+
+import httpx  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+
+# (username, password, prompt) - each prompt maps to an action the user may perform.
+USERS = [
+    ("teller1", "password1", "Transfer $100 to my savings account"),
+    ("advisor1", "password2", "What is the balance of the checking account?"),
+    ("manager1", "password3", "Transfer $250 to the savings account"),
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.flows = 0
+        self.shed = 0
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> None:
+        print(f"\nCompleted {self.flows} full flows in {elapsed:.2f}s ({self.flows / elapsed:.2f} flows/s)")
+        print(f"Intent requests shed by admission control (429/503): {self.shed}\n")
+        header = f"{'endpoint':<18}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        print(header)
+        print("-" * len(header))
+        for endpoint in ("/auth/login", "/auth/intent", "/auth/delegate", "/agent/execute"):
+            values = sorted(self.latencies.get(endpoint, []))
+            if not values:
+                continue
+            print(
+                f"{endpoint:<18}{len(values):>8}{self.errors[endpoint]:>8}{len(values) / elapsed:>10.2f}"
+                f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+                f"{percentile(values, 99) * 1000:>10.1f}{values[-1] * 1000:>10.1f}"
+            )
+
+
+async def timed(recorder: Recorder, endpoint: str, call) -> httpx.Response:
+    start = time.perf_counter()
+    try:
+        response = await call()
+    except httpx.HTTPError:
+        recorder.record(endpoint, time.perf_counter() - start, ok=False)
+        raise
+    recorder.record(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+    return response
+
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, user_index: int, deadline: float) -> None:
+    username, password, prompt = USERS[user_index % len(USERS)]
+
+    response = await timed(recorder, "/auth/login", lambda: client.post(
+        "/auth/login", data={"username": username, "password": password}))
+    if response.status_code != 200:
+        return
+    user_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    while time.perf_counter() < deadline:
+        try:
+            response = await timed(recorder, "/auth/intent", lambda: client.post(
+                "/auth/intent", json={"prompt": prompt}, headers=headers))
+            if response.status_code in (429, 503):
+                # Admission control shed the request; back off as instructed.
+                recorder.shed += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                continue
+            if response.status_code != 200:
+                continue
+            intent = response.json()
+
+            response = await timed(recorder, "/auth/delegate", lambda: client.post(
+                "/auth/delegate", json={"user_token": user_token, "intent": intent}, headers=headers))
+            if response.status_code != 200:
+                continue
+            agent_headers = {"Authorization": f"Bearer {response.json()['agent_token']}"}
+
+            response = await timed(recorder, "/agent/execute", lambda: client.post(
+                "/agent/execute",
+                json={"action": intent["action"], "account_id": "ACC-0001", "amount": int(intent.get("amount") or 0)},
+                headers=agent_headers))
+            if response.status_code == 200:
+                recorder.flows += 1
+        except httpx.HTTPError:
+            continue
+
+
+async def run(args) -> None:
+    recorder = Recorder()
+    timeout = httpx.Timeout(60.0)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=timeout)
+        lifespan = None
+    else:
+        import main  # imported late so the mock LLM settings are picked up
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://loadtest", timeout=timeout)
+        lifespan = main.app.router.lifespan_context(main.app)
+
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(virtual_user(client, recorder, i, deadline) for i in range(args.users)))
+            elapsed = time.perf_counter() - start
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    recorder.report(elapsed)
+
+
+def prepare_workdir(workdir: str) -> None:
+    """Copies the files the backend reads from its working directory into workdir."""
+    for name in (".env", "blocked_keywords.json"):
+        src = os.path.join(BACKEND_DIR, name)
+        if os.path.exists(src):
+            shutil.copy(src, workdir)
+    keys_dir = os.path.join(BACKEND_DIR, "keys")
+    if os.path.isdir(keys_dir):
+        shutil.copytree(keys_dir, os.path.join(workdir, "keys"))
+    os.chdir(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test for the FinLLM backend.")
+    parser.add_argument("--users", type=int, default=10, help="Number of concurrent virtual users.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Test duration in seconds.")
+    parser.add_argument("--latency", default="lognormal:300,0.4", help="Mock LLM latency spec (see mock_llm_server.py).")
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--base-url", default=None, help="Drive a running server instead of main.app in-process.")
+    parser.add_argument("--user-limits", action="store_true",
+                        help="Keep the per-user intent rate limit (virtual users share three accounts, so it is lifted by default).")
+    parser.add_argument("--in-place", action="store_true", help="Use the backend directory (and its databases) directly.")
+    args = parser.parse_args()
+
+    mock_server = start_mock_server(port=args.mock_port, latency=args.latency)
+    print(f"Mock LLM running on 127.0.0.1:{args.mock_port} (latency={args.latency})")
+
+    if not args.base_url:
+        os.environ["LLM_BACKEND"] = "mock"
+        os.environ["MOCK_LLM_URL"] = f"http://127.0.0.1:{args.mock_port}"
+        os.environ.setdefault("GOOGLE_GEMINI_API_KEY", "offline-load-test")
+        if not args.user_limits:
+            os.environ.setdefault("INTENT_USER_RATE", "1000000")
+            os.environ.setdefault("INTENT_USER_BURST", "1000000")
+        if args.in_place:
+            os.chdir(BACKEND_DIR)
+        else:
+            prepare_workdir(tempfile.mkdtemp(prefix="finllm-loadtest-"))
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        mock_server.shutdown()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini intent parser.
+
+Serves POST /generate with {"prompt": "...", "system_instruction": "..."} and
+answers with a canned JSON intent after a latency drawn from a configurable
+distribution. The response also carries approximate token usage (about four
+characters per token). A system instruction that was already seen counts as
+cached input, which imitates the prefix caching of the real backend. Point the
+backend at it with LLM_BACKEND=mock and MOCK_LLM_URL=http://host:port.
+
+Latency specs (milliseconds):
+    constant:200
+    uniform:100,400
+    normal:200,50          (mean, stddev)
+    lognormal:200,0.5      (median, sigma)
+    exponential:200        (mean)
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+# Keyword -> intent returned by the mock. The first keyword found in the user
+# prompt wins; anything else falls back to "informational".
+DEFAULT_INTENTS = {
+    "transfer": {"action": "transfer", "target": "savings account", "amount": 100.0, "unit": "dollars"},
+    "balance": {"action": "check_balance", "target": "checking account", "amount": None, "unit": None},
+    "bill": {"action": "pay_bill", "target": "electricity", "amount": 75.0, "unit": "dollars"},
+    "loan": {"action": "approve_loan", "target": "loan application", "amount": 5000.0, "unit": "dollars"},
+    "open": {"action": "create_account", "target": "new customer", "amount": None, "unit": None},
+}
+FALLBACK_INTENT = {"action": "informational", "target": None, "amount": None, "unit": None}
+
+USER_PROMPT_RE = re.compile(r"User Prompt: '(.*)'\s*$", re.DOTALL)
+
+
+def approx_tokens(text: Optional[str]) -> int:
+    return (len(text) + 3) // 4 if text else 0
+
+
+def usage_for(prompt: str, system_instruction: Optional[str], output: str, seen_instructions: set,
+              lock: threading.Lock) -> Dict[str, int]:
+    instruction_tokens = approx_tokens(system_instruction)
+    with lock:
+        cached = system_instruction in seen_instructions
+        if system_instruction:
+            seen_instructions.add(system_instruction)
+    return {
+        "prompt_token_count": instruction_tokens + approx_tokens(prompt),
+        "candidates_token_count": approx_tokens(output),
+        "cached_content_token_count": instruction_tokens if cached else 0,
+    }
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Returns a sampler producing latencies in seconds for the given spec."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+
+    if kind == "constant":
+        (ms,) = values or [0.0]
+        return lambda: ms / 1000.0
+    if kind == "uniform":
+        low, high = values
+        return lambda: random.uniform(low, high) / 1000.0
+    if kind == "normal":
+        mean, stddev = values
+        return lambda: max(0.0, random.gauss(mean, stddev)) / 1000.0
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma) / 1000.0
+    if kind == "exponential":
+        (mean,) = values
+        return lambda: random.expovariate(1.0 / mean) / 1000.0
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+def canned_intent(prompt: str, intents: Dict[str, dict]) -> dict:
+    match = USER_PROMPT_RE.search(prompt)
+    user_prompt = (match.group(1) if match else prompt).lower()
+    for keyword, intent in intents.items():
+        if keyword in user_prompt:
+            break
+    else:
+        intent = FALLBACK_INTENT
+    return {
+        **intent,
+        "is_safe": True,
+        "confidence_score": 0.95,
+        "reasoning": "Canned response from the mock LLM server.",
+    }
+
+
+def make_handler(sample_latency: Callable[[], float], intents: Dict[str, dict]):
+    seen_instructions: set = set()
+    lock = threading.Lock()
+
+    class MockLLMHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/generate":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt = request.get("prompt", "")
+            system_instruction = request.get("system_instruction")
+
+            time.sleep(sample_latency())
+            text = json.dumps(canned_intent(prompt, intents))
+            usage = usage_for(prompt, system_instruction, text, seen_instructions, lock)
+
+            body = json.dumps({"text": text, "usage": usage}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockLLMHandler
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 8765, latency: str = "constant:0",
+                      intents: Optional[Dict[str, dict]] = None) -> ThreadingHTTPServer:
+    """Starts the mock server on a daemon thread and returns it (call .shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(parse_latency(latency), intents or DEFAULT_INTENTS))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock LLM server for offline load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:300,0.4", help="Latency distribution spec (see module docstring).")
+    parser.add_argument("--intents", default=None, help="JSON file mapping prompt keywords to intent objects.")
+    args = parser.parse_args()
+
+    intents = DEFAULT_INTENTS
+    if args.intents:
+        with open(args.intents, "r") as f:
+            intents = json.load(f)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(parse_latency(args.latency), intents))
+    print(f"Mock LLM listening on http://{args.host}:{args.port} (latency={args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Re-encrypts the audit ledger (acl.db) under the primary DB key after a key
+rotation. Safe to run while the server is up, and resumable if interrupted.
+
+Rotation steps:
+    1. python scripts/rotate_audit_key.py --new-key       # prints a fresh Fernet key
+    2. In .env: move the current key to DB_ENCRYPTION_PREVIOUS_KEYS ("1:<old key>"),
+       set DB_ENCRYPTION_KEY to the new key and bump DB_ENCRYPTION_KEY_VERSION.
+       Restart the server: new events use the new key, old ones stay readable.
+    3. python scripts/rotate_audit_key.py --rate 500      # or POST /admin/audit/reencryption
+    4. Once the old version is listed in retirable_key_versions (no hot rows left
+       and no archive segment written with it), the old key can be dropped from
+       DB_ENCRYPTION_PREVIOUS_KEYS (pin AUDIT_INDEX_KEY first, see --show-index-key).
+       Archived segments are never re-encrypted, so their keys must stay configured.
+"""
+import argparse
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from cryptography.fernet import Fernet  # noqa: E402
+
+from core import acl  # noqa: E402
+from core.key_rotation import REENCRYPT_BATCH_SIZE, REENCRYPT_ROWS_PER_SECOND, ReencryptionJob  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encrypt the audit ledger under the primary DB key.")
+    parser.add_argument("--batch-size", type=int, default=REENCRYPT_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=REENCRYPT_ROWS_PER_SECOND, help="Rows per second (0 = unthrottled).")
+    parser.add_argument("--status", action="store_true", help="Only print the current progress.")
+    parser.add_argument("--new-key", action="store_true", help="Print a new Fernet key and exit.")
+    parser.add_argument("--show-index-key", action="store_true",
+                        help="Print the blind-index key in use, to pin it as AUDIT_INDEX_KEY before retiring old keys.")
+    args = parser.parse_args()
+
+    if args.new_key:
+        print(Fernet.generate_key().decode())
+        sys.exit(0)
+    if args.show_index_key:
+        print("hex:" + acl._index_key.hex())
+        sys.exit(0)
+
+    acl.init_db()
+    job = ReencryptionJob(batch_size=args.batch_size, rows_per_second=args.rate)
+    if not args.status:
+        print(f"Re-encrypting audit rows under key v{job.target_version} "
+              f"(batch {args.batch_size}, {args.rate:g} rows/s)...")
+        try:
+            job.run()
+        except KeyboardInterrupt:
+            print("Interrupted; progress is saved, run again to resume.")
+    print(json.dumps(job.status(), indent=2))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Re-verifies every ATV signature stored in the audit ledger (query_success
+events), decrypting and checking rows across a process pool:
+
+    python scripts/verify_audit_signatures.py
+    python scripts/verify_audit_signatures.py --workers 8 --chunk-size 1000
+    python scripts/verify_audit_signatures.py --since-id 250000 --json
+
+Batch items are checked through their Merkle inclusion proof against the
+signed batch root. Exits with status 1 if any row fails, so it can run as a
+nightly integrity job.
+"""
+import argparse
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from core.acl import DB_PATH  # noqa: E402
+from core.atv_audit import PUBLIC_KEY_PATH, verify_ledger  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-verify the ATV signatures stored in the audit ledger.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--public-key", default=PUBLIC_KEY_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows handed to a worker at a time.")
+    parser.add_argument("--since-id", type=int, default=0, help="Only check events with a larger ID.")
+    parser.add_argument("--max-reported", type=int, default=100, help="Mismatches listed in the report.")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = verify_ledger(args.db, args.public_key, args.workers, args.chunk_size, args.since_id, args.max_reported)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Checked {report['rows_checked']} signed events in {report['elapsed_seconds']}s "
+              f"({report['rows_per_second']} rows/s, {report['workers']} workers)")
+        if report["failed"]:
+            print(f"{report['failed']} events FAILED verification; first failing event ID: {report['first_failing_id']}")
+            for mismatch in report["mismatches"]:
+                print(f"  #{mismatch['event_id']}: {mismatch['reason']}")
+        else:
+            print("All signatures verified.")
+    sys.exit(1 if report["failed"] else 0)
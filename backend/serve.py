@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Pre-fork server entry point.
+
+    python serve.py --workers 4 --port 8000
+
+`uvicorn main:app --workers N` starts N fresh interpreters, and each one
+imports spaCy's en_core_web_sm, loads the RSA keys and compiles every LDG
+pattern on its own. This entry point does that work once in the master
+process, then forks the workers. The workers share the loaded pages
+copy-on-write:
+
+  - gc is disabled while the app is imported and the surviving objects are
+    moved to the permanent generation (gc.freeze) before forking, so the
+    workers' garbage collector never writes to, and thereby copies, the
+    shared pages.
+  - Connections, threads and executors are only created after the fork
+    (database engine disposed, lifespan runs in each worker).
+  - All workers accept on one listening socket opened by the master.
+
+With more than one worker, single-use agent tokens must be tracked in a
+store the workers share, so REPLAY_STORE_BACKEND defaults to sqlite here and
+an explicit "memory" is refused. Admission limits (core/admission.py) stay
+per worker; the effective totals are printed at startup.
+
+The master restarts workers that die and forwards SIGINT/SIGTERM to them.
+POSIX only (needs os.fork).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def preload():
+    """Imports the application (spaCy model, keys, rule sets) and prepares the databases."""
+    gc.disable()
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+
+    import main
+    from db.session import engine
+
+    main.init_storage()
+    # Pooled connections must not be shared with the children.
+    engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def configure_replay_store(workers: int) -> None:
+    """Makes the workers share one replay store; must run before the app is imported."""
+    if workers <= 1:
+        return
+    backend = os.environ.setdefault("REPLAY_STORE_BACKEND", "sqlite")
+    if backend != "sqlite":
+        sys.exit(f"REPLAY_STORE_BACKEND={backend} keeps a separate replay store in each of the {workers} "
+                 "workers, so an agent token could be used once per worker. "
+                 "Use REPLAY_STORE_BACKEND=sqlite or --workers 1.")
+
+
+def describe_admission_limits(workers: int) -> str:
+    from core import admission
+
+    role_rates = ", ".join(f"{role} {rate * workers:g}/s" for role, rate in admission.INTENT_ROLE_RATES.items())
+    return (f"Admission limits apply per worker; with {workers} workers the totals are "
+            f"{admission.INTENT_USER_RATE * workers:g} intent calls/s per user, "
+            f"{admission.LLM_MAX_CONCURRENCY * workers} concurrent LLM calls"
+            + (f" and per role: {role_rates}" if role_rates else ""))
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, args) -> None:
+    import uvicorn
+
+    gc.enable()
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Worker: default signal handling; uvicorn installs its own.
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(app, sock, args)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork FinLLM server: preload once, fork workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    configure_replay_store(args.workers)
+
+    start = time.perf_counter()
+    app = preload()
+    sock = bind_socket(args.host, args.port, args.backlog)
+    print(f"Preloaded application in {time.perf_counter() - start:.1f}s; "
+          f"forking {args.workers} workers on {args.host}:{args.port} (master pid {os.getpid()})")
+    if args.workers > 1:
+        print(describe_admission_limits(args.workers))
+
+    workers = {spawn(app, sock, args) for _ in range(args.workers)}
+    stopping = False
+
+    def _shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting.")
+            workers.add(spawn(app, sock, args))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
+import asyncio
 import os
+import re
+import json
 import time
+import uuid
 import base64
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, Iterator, List, Tuple
 from fastapi import HTTPException, status
 from pydantic import BaseModel, ValidationError
 from jose import jwt, JWTError
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey, RSAPublicKey
 
 # Import core security and audit components
-from core.acl import log_event 
-from core.atv import load_private_key, load_public_key, sign_request, verify_signature
-from core.ldg import ldg_input_check, detect_prompt_injection, ldg_output_check
+from core.acl import log_event_async, log_events_async
+from core.atv import load_private_key, load_public_key, sign_request, verify_signature, merkle_tree, merkle_root_from_proof
+from core.executors import NER_EXECUTOR, CRYPTO_EXECUTOR, run_in
+from core.replay import REPLAY_STORE, ReplayStoreFull
+from core.ldg import RULE_STORE, IncrementalOutputGuard, analyze, ldg_input_check, ldg_input_check_batch, detect_prompt_injection, detect_prompt_injection_batch, ldg_output_check
 from schemas.employee import ActionRequest # Used for input validation
 
 # --- Initialization of Cryptographic Keys and State (UNCHANGED) ---
@@ -22,6 +28,9 @@ try:
 except Exception as e:
     raise RuntimeError(f"Failed to load cryptographic keys (ATV): {e}")
 
+# Upper bound on the number of actions accepted by a single batch call.
+MAX_BATCH_SIZE = 100
+
 # Simple structure to store required claims for agent token validation
 class AgentTokenClaims(BaseModel):
     sub: str
@@ -29,11 +38,52 @@ class AgentTokenClaims(BaseModel):
     action: str
     target: str
 
+class PreparedExecution:
+    """State carried from the input-side checks to the response stage of one request."""
+    __slots__ = ("claims", "rules", "user_input", "masked_input", "signature", "valid")
+
+    def __init__(self, claims, rules, user_input, masked_input, signature, valid):
+        self.claims = claims
+        self.rules = rules
+        self.user_input = user_input
+        self.masked_input = masked_input
+        self.signature = signature
+        self.valid = valid
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# --- CPU-bound stages, run on the sized executors in core.executors ---
+def _input_checks(input_ctx, rules) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # NER and both regex filters in one hop; they share the same analysis context.
+    return ldg_input_check(input_ctx, rules), detect_prompt_injection(input_ctx, rules)
+
+
+def _batch_input_checks(input_contexts: list, rules) -> List[Tuple[Dict[str, Any], Any]]:
+    input_results = ldg_input_check_batch(input_contexts, rules)
+    passed = [i for i, r in enumerate(input_results) if r["status"] != "blocked"]
+    inj_results = dict(zip(passed, detect_prompt_injection_batch([input_contexts[i] for i in passed], rules)))
+    return [(input_result, inj_results.get(i)) for i, input_result in enumerate(input_results)]
+
+
+def _sign_and_verify(message: str) -> Tuple[bytes, bool]:
+    signature = sign_request(message, PRIVATE_KEY)
+    return signature, verify_signature(message, signature, PUBLIC_KEY)
+
+
+def _sign_batch(messages: List[str]) -> Tuple[str, list, bytes, bool]:
+    root, proofs = merkle_tree(messages)
+    signature, valid = _sign_and_verify(root)
+    return root, proofs, signature, valid
+
+
 class ExecutionService:
     def __init__(self):
         pass
 
-    def _validate_agent_token(self, agent_token: str) -> AgentTokenClaims:
+    async def _validate_agent_token(self, agent_token: str) -> AgentTokenClaims:
         """
         Validates the agent's restricted JWT and extracts key delegation claims.
         """
@@ -63,7 +113,7 @@ class ExecutionService:
             action = parts[0]
             target = parts[1]
 
-            return AgentTokenClaims(
+            claims = AgentTokenClaims(
                 sub=payload.get("sub"),
                 roles=roles,
                 action=action,
@@ -86,17 +136,65 @@ class ExecutionService:
                 detail=f"Token validation failed: {e}"
             )
 
-    def execute_secured_query(self, agent_token: str, request: ActionRequest) -> Dict[str, Any]:
+        await self._consume_token(payload)
+        return claims
+
+    @staticmethod
+    async def _consume_token(payload: Dict[str, Any]) -> None:
         """
-        Runs the full security and execution pipeline (LDG, ATV, ACL) with server-side transparency.
+        Marks the agent token as used. A token is accepted once; a batch or a
+        stream counts as a single use. Stores that do I/O (SQLite) run on a
+        worker thread so lock waits never stall the event loop.
+        """
+        jti = payload.get("jti")
+        if not jti:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Agent Delegation Token has no token ID (jti)."
+            )
+        try:
+            if REPLAY_STORE.blocking:
+                first_use = await asyncio.to_thread(REPLAY_STORE.check_and_record, jti, payload["exp"])
+            else:
+                first_use = REPLAY_STORE.check_and_record(jti, payload["exp"])
+        except ReplayStoreFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many active agent tokens, try again shortly.",
+                headers={"Retry-After": "1"}
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Agent Delegation Token lifetime is too long."
+            )
+        if not first_use:
+            print(f"ATV: Replayed Agent Token rejected (user {payload.get('sub')}).")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Agent Delegation Token has already been used."
+            )
+
+    @staticmethod
+    def _build_user_input(claims: AgentTokenClaims, request: ActionRequest) -> str:
+        amount_str = str(request.amount) if request.amount is not None else "N/A"
+        return f"Action:{claims.action} Target:{claims.target} Amount:{amount_str}"
+
+    async def _prepare_execution(self, agent_token: str, request: ActionRequest) -> "PreparedExecution":
+        """
+        Runs every stage that must pass before the agent may respond: token
+        validation, LDG input checks and ATV signing. Raises HTTPException on
+        failure, so streaming callers can still answer with a proper status code.
+
+        NER and RSA signing run on their own executors so the event loop keeps
+        serving other requests meanwhile.
         """
         
         # 1. Validate Agent Token and Delegation Scope
-        claims = self._validate_agent_token(agent_token)
+        claims = await self._validate_agent_token(agent_token)
         
         # Construct the user_input from the validated claims (the true intent)
-        amount_str = str(request.amount) if request.amount is not None else "N/A"
-        user_input = f"Action:{claims.action} Target:{claims.target} Amount:{amount_str}"
+        user_input = self._build_user_input(claims, request)
 
         # --- SERVER CONSOLE TRACE START ---
         print("\n--- SECURE EXECUTION TRACE ---")
@@ -105,58 +203,86 @@ class ExecutionService:
         # --- END TRACE ---
 
         # --- SECURITY GATEWAY (LDG - Input) ---
+        # The whole request is evaluated against one rule version, even if a reload lands mid-request.
+        rules = RULE_STORE.current()
+
+        # One analysis context (normalized text, NER doc) shared by all input filters.
+        input_ctx = analyze(user_input)
+
         # 2. Input Sanitize (PII Masking, Entity Recognition)
-        input_result = ldg_input_check(user_input)
-        
         # 3. Prompt Injection Detection (Pre-Filter Check)
-        inj_result = detect_prompt_injection(user_input)
+        input_result, inj_result = await run_in(NER_EXECUTOR, _input_checks, input_ctx, rules)
         
         # --- SECURITY DECISION ---
         if input_result["status"] == "blocked":
             print(f"SDG: Input Blocked! Reason: {input_result['reason']}")
-            log_event("query_blocked", {"reason": input_result["reason"], "user_sub": claims.sub})
+            await log_event_async("query_blocked", {"reason": input_result["reason"], "user_sub": claims.sub, "ldg_rules_version": rules.version})
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=input_result["reason"])
         
         if inj_result["status"] == "blocked":
             print(f"SDG: PI Blocked! Reason: {inj_result['reason']}")
-            log_event("query_blocked", {"reason": inj_result["reason"], "user_sub": claims.sub})
+            await log_event_async("query_blocked", {"reason": inj_result["reason"], "user_sub": claims.sub, "ldg_rules_version": rules.version})
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=inj_result["reason"])
 
         masked_input = input_result.get("masked_input", user_input)
         
         # --- MESSAGE INTEGRITY (ATV - Signing) ---
         try:
-            signature = sign_request(masked_input, PRIVATE_KEY)
-            valid = verify_signature(masked_input, signature, PUBLIC_KEY)
+            signature, valid = await run_in(CRYPTO_EXECUTOR, _sign_and_verify, masked_input)
             
             print(f"SDG: PII Masked Query: '{masked_input}'")
             print(f"ATV: Signature Generated. Verification Status: {valid}")
             
         except Exception as e:
             print(f"ATV: Cryptographic Signing Failed! Error: {e}")
-            log_event("security_fail", {"error": str(e), "user_sub": claims.sub})
+            await log_event_async("security_fail", {"error": str(e), "user_sub": claims.sub, "ldg_rules_version": rules.version})
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Cryptographic signing failed.")
 
+        return PreparedExecution(claims, rules, user_input, masked_input, signature, valid)
+
+    @staticmethod
+    def _agent_response(prepared: "PreparedExecution") -> str:
         # --- FCA (Simulated LLM Agent Execution) ---
-        agent_response = f"FCA: Successfully executed '{claims.action}' for user {claims.sub} on target '{claims.target}'. Signed message verified: {valid}"
+        claims = prepared.claims
+        return f"FCA: Successfully executed '{claims.action}' for user {claims.sub} on target '{claims.target}'. Signed message verified: {prepared.valid}"
+
+    @staticmethod
+    def _agent_response_chunks(agent_response: str) -> Iterator[str]:
+        # Simulates a token-by-token LLM stream of the agent response.
+        for match in re.finditer(r"\S+\s*", agent_response):
+            yield match.group(0)
+
+    @staticmethod
+    def _success_payload(prepared: "PreparedExecution", agent_response: str) -> Dict[str, Any]:
+        return {
+            "user_sub": prepared.claims.sub,
+            "delegated_action": prepared.claims.action,
+            "input_original": prepared.user_input,
+            "input_masked": prepared.masked_input,
+            "signature_hex": prepared.signature.hex() if isinstance(prepared.signature, bytes) else "N/A",
+            "atv_verified": prepared.valid,
+            "agent_response": agent_response,
+            "ldg_rules_version": prepared.rules.version
+        }
+
+    async def execute_secured_query(self, agent_token: str, request: ActionRequest) -> Dict[str, Any]:
+        """
+        Runs the full security and execution pipeline (LDG, ATV, ACL) with server-side transparency.
+        """
+        prepared = await self._prepare_execution(agent_token, request)
+        claims, rules = prepared.claims, prepared.rules
+
+        agent_response = self._agent_response(prepared)
 
         # --- SECURITY GATEWAY (LDG - Output) ---
-        output_result = ldg_output_check(agent_response)
+        output_result = ldg_output_check(agent_response, rules)
         if output_result["status"] == "blocked":
             print(f"SDG: Output Blocked! Reason: {output_result['reason']}")
-            log_event("output_blocked", {"reason": output_result["reason"], "user_sub": claims.sub})
+            await log_event_async("output_blocked", {"reason": output_result["reason"], "user_sub": claims.sub, "ldg_rules_version": rules.version})
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=output_result["reason"])
 
         # --- AUDIT (ACL) ---
-        event_id = log_event("query_success", {
-            "user_sub": claims.sub,
-            "delegated_action": claims.action,
-            "input_original": user_input,
-            "input_masked": masked_input,
-            "signature_hex": signature.hex() if isinstance(signature, bytes) else "N/A",
-            "atv_verified": valid,
-            "agent_response": agent_response
-        })
+        event_id = await log_event_async("query_success", self._success_payload(prepared, agent_response))
         
         print(f"ACL: Event Logged Successfully. ID: {event_id}")
         print("-----------------------------\n")
@@ -165,4 +291,169 @@ class ExecutionService:
             "response": agent_response,
             "event_id": event_id,
             "status": "Transaction executed and logged successfully."
-        }
\ No newline at end of file
+        }
+
+    async def stream_secured_query(self, agent_token: str, request: ActionRequest) -> AsyncIterator[str]:
+        """
+        Streaming variant of execute_secured_query. All input-side checks run
+        before the first byte is sent; the agent response is then streamed as
+        Server-Sent Events through an IncrementalOutputGuard.
+        """
+        prepared = await self._prepare_execution(agent_token, request)
+        return self._stream_events(prepared)
+
+    async def _stream_events(self, prepared: "PreparedExecution") -> AsyncIterator[str]:
+        claims, rules = prepared.claims, prepared.rules
+        guard = IncrementalOutputGuard(rules)
+        released: List[str] = []
+
+        # --- SECURITY GATEWAY (LDG - Output), incremental ---
+        for chunk in self._agent_response_chunks(self._agent_response(prepared)):
+            result = guard.feed(chunk)
+            if result["status"] == "blocked":
+                break
+            if result["emit"]:
+                released.append(result["emit"])
+                yield _sse("chunk", {"text": result["emit"]})
+        else:
+            result = guard.finish()
+            if result["emit"]:
+                released.append(result["emit"])
+                yield _sse("chunk", {"text": result["emit"]})
+
+        if result["status"] == "blocked":
+            print(f"SDG: Streamed Output Blocked! Reason: {result['reason']}")
+            await log_event_async("output_blocked", {"reason": result["reason"], "user_sub": claims.sub, "ldg_rules_version": rules.version})
+            yield _sse("blocked", {"detail": result["reason"]})
+            return
+
+        # --- AUDIT (ACL) ---
+        event_id = await log_event_async("query_success", self._success_payload(prepared, "".join(released)))
+        print(f"ACL: Streamed Event Logged Successfully. ID: {event_id}")
+        print("-----------------------------\n")
+
+        yield _sse("done", {"event_id": event_id, "status": "Transaction executed and logged successfully."})
+
+    async def execute_secured_batch(self, agent_token: str, requests: List[ActionRequest]) -> Dict[str, Any]:
+        """
+        Runs the security pipeline for many actions under a single delegation token.
+
+        The token is validated once, LDG input checks and NER run over the whole
+        batch, every accepted item is covered by one Merkle-root RSA signature,
+        and all audit events are written in a single transaction. Failures are
+        reported per item instead of aborting the batch.
+        """
+        if not requests:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch contains no actions.")
+        if len(requests) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Batch too large ({len(requests)} actions, maximum is {MAX_BATCH_SIZE})."
+            )
+
+        # 1. Validate Agent Token and Delegation Scope (once for the whole batch)
+        claims = await self._validate_agent_token(agent_token)
+        batch_id = uuid.uuid4().hex
+        rules = RULE_STORE.current()
+
+        print("\n--- SECURE BATCH EXECUTION TRACE ---")
+        print(f"[{time.strftime('%H:%M:%S')}] User: {claims.sub} | Action: {claims.action} | Target: {claims.target} | Items: {len(requests)}")
+        print(f"ATV: Agent Token Decoded & Validated. Batch ID: {batch_id}")
+
+        results: List[Dict[str, Any]] = [{"index": i} for i in range(len(requests))]
+        events: List[tuple] = []
+        event_slots: List[int] = []
+
+        def _fail(index: int, event_type: str, reason: str) -> None:
+            results[index].update({"status": "blocked", "error": reason})
+            events.append((event_type, {"reason": reason, "user_sub": claims.sub, "batch_id": batch_id,
+                                        "batch_index": index, "ldg_rules_version": rules.version}))
+            event_slots.append(index)
+
+        # Every item must stay within the delegated action.
+        user_inputs: Dict[int, str] = {}
+        for i, request in enumerate(requests):
+            if request.action != claims.action:
+                _fail(i, "query_blocked", f"Action '{request.action}' is outside the delegated scope '{claims.action}'.")
+            else:
+                user_inputs[i] = self._build_user_input(claims, request)
+
+        # --- SECURITY GATEWAY (LDG - Input), batched ---
+        indices = list(user_inputs)
+        input_contexts = {i: analyze(user_inputs[i]) for i in indices}
+        check_results = await run_in(NER_EXECUTOR, _batch_input_checks, [input_contexts[i] for i in indices], rules)
+        accepted: List[int] = []
+        masked_inputs: Dict[int, str] = {}
+        for i, (input_result, inj_result) in zip(indices, check_results):
+            if input_result["status"] == "blocked":
+                _fail(i, "query_blocked", input_result["reason"])
+                continue
+            if inj_result["status"] == "blocked":
+                _fail(i, "query_blocked", inj_result["reason"])
+                continue
+            masked_inputs[i] = input_result.get("masked_input", user_inputs[i])
+            accepted.append(i)
+
+        print(f"SDG: {len(accepted)}/{len(requests)} items passed input checks.")
+
+        # --- MESSAGE INTEGRITY (ATV - Signing), one signature for the batch ---
+        if accepted:
+            try:
+                root, proofs, signature, valid = await run_in(
+                    CRYPTO_EXECUTOR, _sign_batch, [masked_inputs[i] for i in accepted])
+                print(f"ATV: Batch Merkle root {root} signed. Verification Status: {valid}")
+            except Exception as e:
+                print(f"ATV: Cryptographic Signing Failed! Error: {e}")
+                await log_event_async("security_fail", {"error": str(e), "user_sub": claims.sub, "batch_id": batch_id,
+                                                        "ldg_rules_version": rules.version})
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Cryptographic signing failed.")
+
+            for position, i in enumerate(accepted):
+                item_valid = valid and merkle_root_from_proof(masked_inputs[i], proofs[position]) == root
+
+                # --- FCA (Simulated LLM Agent Execution) ---
+                agent_response = f"FCA: Successfully executed '{claims.action}' for user {claims.sub} on target '{claims.target}'. Signed message verified: {item_valid}"
+
+                # --- SECURITY GATEWAY (LDG - Output) ---
+                output_result = ldg_output_check(agent_response, rules)
+                if output_result["status"] == "blocked":
+                    _fail(i, "output_blocked", output_result["reason"])
+                    continue
+
+                results[i].update({"status": "success", "response": agent_response})
+                events.append(("query_success", {
+                    "user_sub": claims.sub,
+                    "delegated_action": claims.action,
+                    "input_original": user_inputs[i],
+                    "input_masked": masked_inputs[i],
+                    "signature_hex": signature.hex(),
+                    "atv_verified": item_valid,
+                    "agent_response": agent_response,
+                    "batch_id": batch_id,
+                    "batch_index": i,
+                    "merkle_root": root,
+                    "merkle_proof": proofs[position],
+                    "ldg_rules_version": rules.version,
+                }))
+                event_slots.append(i)
+
+        # --- AUDIT (ACL), single transaction for the whole batch ---
+        # Write events in item order so event IDs follow the request order.
+        order = sorted(range(len(events)), key=lambda k: event_slots[k])
+        events = [events[k] for k in order]
+        event_slots = [event_slots[k] for k in order]
+        event_ids = await log_events_async(events)
+        for i, event_id in zip(event_slots, event_ids):
+            results[i]["event_id"] = event_id
+
+        succeeded = sum(1 for r in results if r["status"] == "success")
+        print(f"ACL: {len(event_ids)} Events Logged in one transaction.")
+        print("-----------------------------\n")
+
+        return {
+            "batch_id": batch_id,
+            "results": results,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "status": f"Batch processed: {succeeded}/{len(results)} actions executed and logged."
+        }
@@ -0,0 +1,10 @@
+import os
+import sys
+
+from cryptography.fernet import Fernet
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# core.acl refuses to import without a key; tests only touch temporary databases.
+os.environ.setdefault("DB_ENCRYPTION_KEY", Fernet.generate_key().decode())
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from core.admission import AdmissionController, AdmissionRejected, TokenBucketLimiter
+
+# Role strings of the users seeded by main.py.
+TELLER1 = ["teller", "customer_service"]
+ADVISOR1 = ["advisor", "audit_reader"]
+MANAGER1 = ["manager", "teller", "transaction_override"]
+
+
+def _controller(**kwargs):
+    kwargs.setdefault("user_rate", 100.0)
+    kwargs.setdefault("user_burst", 100.0)
+    kwargs.setdefault("role_priorities", {})
+    return AdmissionController(**kwargs)
+
+
+async def _admit(controller, user, roles):
+    async with controller.admit(user, roles):
+        pass
+
+
+def _admit_sync(controller, user, roles):
+    asyncio.run(_admit(controller, user, roles))
+
+
+def test_role_rate_applies_to_every_user_holding_the_role():
+    # rate 1/s -> burst 2: the teller pool is shared by teller1 and manager1.
+    controller = _controller(role_rates={"teller": 1.0})
+    _admit_sync(controller, "teller1", TELLER1)
+    _admit_sync(controller, "manager1", MANAGER1)
+    for user, roles in (("teller1", TELLER1), ("manager1", MANAGER1)):
+        with pytest.raises(AdmissionRejected) as exc:
+            _admit_sync(controller, user, roles)
+        assert exc.value.status_code == 429
+        assert "'teller'" in exc.value.detail
+    # Users without the role are not affected.
+    _admit_sync(controller, "advisor1", ADVISOR1)
+
+
+def test_rejection_refunds_user_and_already_charged_roles():
+    controller = _controller(user_rate=1.0, user_burst=1.0, role_rates={"manager": 1.0, "teller": 1.0})
+    _admit_sync(controller, "teller1", TELLER1)
+    _admit_sync(controller, "teller2", TELLER1)  # the teller pool (burst 2) is now empty
+    with pytest.raises(AdmissionRejected):
+        _admit_sync(controller, "manager1", MANAGER1)
+    # The manager token and the user token were given back.
+    assert controller.role_limiters["manager"]._buckets["manager"][0] == pytest.approx(2.0, abs=0.1)
+    assert controller.user_limiter._buckets["manager1"][0] == pytest.approx(1.0, abs=0.1)
+    assert controller.role_limiters["teller"]._buckets["teller"][0] < 1.0
+
+
+def test_shed_request_refunds_all_role_buckets():
+    controller = _controller(role_rates={"manager": 1.0, "teller": 1.0}, max_concurrency=1, budget_seconds=0.0)
+
+    async def scenario():
+        async with controller.admit("teller1", TELLER1):
+            with pytest.raises(AdmissionRejected) as exc:
+                await _admit(controller, "manager1", MANAGER1)
+            assert exc.value.status_code == 503
+
+    asyncio.run(scenario())
+    assert controller.role_limiters["manager"]._buckets["manager"][0] == pytest.approx(2.0, abs=0.1)
+    # teller1 spent one teller token; manager1's was refunded.
+    assert controller.role_limiters["teller"]._buckets["teller"][0] == pytest.approx(1.0, abs=0.1)
+
+
+def test_gate_priority_uses_highest_priority_role():
+    controller = _controller(role_priorities={"manager": 0, "teller": 2, "customer_service": 2})
+    assert controller._primary_role(MANAGER1) == ("manager", 0)
+    assert controller._primary_role(TELLER1)[1] == 2
+    assert controller._primary_role([])[0] is None
+
+
+@pytest.mark.parametrize("rate,burst", [(0.0, 5.0), (-1.0, 5.0), (1.0, 0.5)])
+def test_token_bucket_rejects_invalid_settings(rate, burst):
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(rate, burst)
+
+
+def test_token_bucket_refills_and_reports_wait():
+    limiter = TokenBucketLimiter(rate=2.0, burst=1.0)
+    assert limiter.try_acquire("k", 10.0) == 0.0
+    assert limiter.try_acquire("k", 10.0) == pytest.approx(0.5)
+    assert limiter.try_acquire("k", 10.5) == 0.0
@@ -0,0 +1,52 @@
+import pytest
+
+from core.atv import merkle_root_from_proof, merkle_tree
+
+
+@pytest.mark.parametrize("size", range(1, 10))
+def test_every_proof_leads_to_the_root(size):
+    messages = [f"Action:transfer Target:acc{i} Amount:{i}" for i in range(size)]
+    root, proofs = merkle_tree(messages)
+    assert len(proofs) == size
+    for message, proof in zip(messages, proofs):
+        assert merkle_root_from_proof(message, proof) == root
+
+
+def test_single_message_root_is_its_leaf_hash():
+    root, proofs = merkle_tree(["only"])
+    assert proofs == [[]]
+    assert merkle_root_from_proof("only", []) == root
+
+
+def test_tampered_message_does_not_verify():
+    messages = ["a", "b", "c", "d", "e"]
+    root, proofs = merkle_tree(messages)
+    assert merkle_root_from_proof("x", proofs[2]) != root
+
+
+def test_proof_of_another_leaf_does_not_verify():
+    messages = ["a", "b", "c", "d"]
+    root, proofs = merkle_tree(messages)
+    assert merkle_root_from_proof("a", proofs[1]) != root
+
+
+def test_tampered_sibling_or_side_does_not_verify():
+    messages = ["a", "b", "c"]
+    root, proofs = merkle_tree(messages)
+    side, sibling = proofs[0][0]
+    flipped_sibling = [[side, ("0" if sibling[0] != "0" else "1") + sibling[1:]]] + proofs[0][1:]
+    flipped_side = [["L" if side == "R" else "R", sibling]] + proofs[0][1:]
+    assert merkle_root_from_proof("a", flipped_sibling) != root
+    assert merkle_root_from_proof("a", flipped_side) != root
+
+
+def test_leaf_and_node_hashes_are_domain_separated():
+    # A two-leaf root must not be accepted as a leaf of a larger tree.
+    root_ab, _ = merkle_tree(["a", "b"])
+    root, proofs = merkle_tree(["a", "b", "c", "d"])
+    assert merkle_root_from_proof(root_ab, proofs[2][1:]) != root
+
+
+def test_empty_batch_is_rejected():
+    with pytest.raises(ValueError):
+        merkle_tree([])
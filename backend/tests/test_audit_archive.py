@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import struct
+
+import pytest
+
+from core import acl, atv_audit
+from core.audit_archive import AuditArchive, Segment, write_segment
+from core.retention import AuditArchiver, fcntl
+
+OLD = "2020-01-01T00:00:00.000000Z"
+
+
+def _rows(ids, key_version=1):
+    return [(i, OLD, "query_success", f"token-{i}", key_version) for i in ids]
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """Temporary acl.db plus an archive directory wired into core.acl."""
+    archive = AuditArchive(str(tmp_path / "archive"))
+    monkeypatch.setattr(acl, "DB_PATH", str(tmp_path / "acl.db"))
+    monkeypatch.setattr(acl, "AUDIT_ARCHIVE", archive)
+    acl.init_db()
+    return archive
+
+
+def _log(count, event_type="query_success"):
+    return [acl.log_event(event_type, {"user_sub": "teller1", "n": i}) for i in range(count)]
+
+
+def _age(ids):
+    conn = sqlite3.connect(acl.DB_PATH)
+    conn.executemany("UPDATE audit SET timestamp = ? WHERE id = ?", [(OLD, i) for i in ids])
+    conn.commit()
+    conn.close()
+
+
+def _hot_ids():
+    conn = sqlite3.connect(acl.DB_PATH)
+    try:
+        return [r[0] for r in conn.execute("SELECT id FROM audit ORDER BY id")]
+    finally:
+        conn.close()
+
+
+# ---------------- segment format ----------------
+def test_segment_round_trip_with_gaps(tmp_path):
+    rows = _rows([5, 6, 9]) + [(12, OLD, "ldg_rules_updated", None, None)]
+    assert write_segment(str(tmp_path), rows) == (5, 12)
+
+    segment = Segment(str(tmp_path), 5, 12)
+    for row in rows:
+        assert segment.read(row[0]) == row
+    for missing in (4, 7, 8, 10, 13):
+        assert segment.read(missing) is None
+    assert list(segment.rows()) == rows
+    assert [r[0] for r in segment.rows(since_id=6)] == [9, 12]
+    assert segment.row_count == 4
+    assert segment.verify()
+
+
+def test_segments_are_read_only(tmp_path):
+    write_segment(str(tmp_path), _rows([1, 2]))
+    for name in os.listdir(tmp_path):
+        assert not os.stat(tmp_path / name).st_mode & 0o222
+
+
+def test_archive_lookup_across_segments(tmp_path):
+    archive = AuditArchive(str(tmp_path))
+    archive.append(_rows(range(1, 4)))
+    archive.append(_rows(range(4, 10, 2)))
+    assert archive.read(3)[0] == 3
+    assert archive.read(8)[0] == 8
+    assert archive.read(5) is None
+    assert archive.read(0) is None and archive.read(100) is None
+    assert archive.last_archived_id() == 8
+    assert [r[0] for r in archive.iter_rows(since_id=2)] == [3, 4, 6, 8]
+    assert archive.status()["rows"] == 6
+
+
+def test_append_refuses_overlapping_or_empty_segments(tmp_path):
+    archive = AuditArchive(str(tmp_path))
+    archive.append(_rows([1, 2, 3]))
+    with pytest.raises(ValueError):
+        archive.append(_rows([3, 4]))
+    with pytest.raises(ValueError):
+        archive.append([])
+
+
+def test_segment_written_by_another_instance_is_found(tmp_path):
+    reader, writer = AuditArchive(str(tmp_path)), AuditArchive(str(tmp_path))
+    writer.append(_rows([1]))
+    assert reader.read(1) is not None
+    writer.append(_rows([2]))
+    assert reader.read(2) is not None
+
+
+def test_corrupt_and_truncated_segments_are_detected(tmp_path):
+    write_segment(str(tmp_path), _rows([1, 2, 3]))
+    data_path = tmp_path / "seg-000000000001-000000000003.dat"
+    index_path = tmp_path / "seg-000000000001-000000000003.idx"
+
+    os.chmod(data_path, 0o644)
+    content = bytearray(data_path.read_bytes())
+    content[-3] ^= 0x01
+    data_path.write_bytes(bytes(content))
+    assert Segment(str(tmp_path), 1, 3).verify() is False
+
+    data_path.write_bytes(bytes(content[:-1]))
+    with pytest.raises(ValueError):
+        Segment(str(tmp_path), 1, 3)
+
+    os.chmod(index_path, 0o644)
+    index_path.write_bytes(b"NOTASEG!" + index_path.read_bytes()[8:])
+    with pytest.raises(ValueError):
+        Segment(str(tmp_path), 1, 3)
+
+
+def test_leftover_temporary_files_are_replaced(tmp_path):
+    tmp_file = tmp_path / "seg-000000000001-000000000002.dat.tmp"
+    tmp_file.write_bytes(b"partial")
+    os.chmod(tmp_file, 0o444)
+    write_segment(str(tmp_path), _rows([1, 2]))
+    assert not tmp_file.exists()
+    assert Segment(str(tmp_path), 1, 2).verify()
+
+
+# ---------------- retention ----------------
+def test_archiver_moves_only_the_expired_prefix(ledger):
+    ids = _log(6)
+    _age(ids[:2] + ids[3:5])  # ids[2] is still recent and stops the prefix
+    expected = {i: acl.get_event(i) for i in ids}
+
+    result = AuditArchiver(ledger, retention_days=30, segment_rows=1).run_once()
+    assert result["archived_rows"] == 2 and result["segments_written"] == 2
+    assert _hot_ids() == ids[2:]
+    assert {i: acl.get_event(i) for i in ids} == expected
+    assert acl.find_events({"user_sub": "teller1"}, limit=100) == [expected[i] for i in reversed(ids[2:])]
+
+
+def test_interrupted_run_is_finished_without_duplicates(ledger):
+    ids = _log(4)
+    _age(ids)
+    conn = sqlite3.connect(acl.DB_PATH)
+    hot_rows = conn.execute(f"SELECT {acl._EVENT_COLUMNS} FROM audit WHERE id <= ? ORDER BY id", (ids[1],)).fetchall()
+    conn.close()
+    # Crash between committing the segment and deleting the hot rows.
+    ledger.append(hot_rows)
+    assert _hot_ids() == ids
+
+    result = AuditArchiver(ledger, retention_days=30).run_once()
+    assert result["archived_rows"] == 2
+    assert _hot_ids() == []
+    assert [r[0] for r in ledger.iter_rows()] == ids
+    assert acl.get_stats([])[0]["count"] == 4
+    assert acl.rebuild_audit_stats() == 4
+    assert acl.get_stats([])[0]["count"] == 4
+
+
+def test_dual_tier_rows_are_streamed_once(ledger):
+    ids = _log(5)
+    _age(ids)
+    conn = sqlite3.connect(acl.DB_PATH)
+    ledger.append(conn.execute(f"SELECT {acl._EVENT_COLUMNS} FROM audit WHERE id <= ? ORDER BY id", (ids[2],)).fetchall())
+    conn.close()
+    streamed = [row[0] for chunk in atv_audit.iter_signed_rows(acl.DB_PATH, 2, archive=ledger) for row in chunk]
+    assert streamed == ids
+
+
+def test_rebuild_stats_keeps_archived_counts(ledger):
+    ids = _log(5, "query_blocked")
+    _age(ids[:3])
+    AuditArchiver(ledger, retention_days=30).run_once()
+    assert acl.rebuild_audit_stats() == 5
+    assert acl.get_stats(["event_type"]) == [{"event_type": "query_blocked", "count": 5}]
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs fcntl")
+def test_run_is_skipped_while_another_process_holds_the_lock(ledger):
+    ids = _log(2)
+    _age(ids)
+    os.makedirs(ledger.directory, exist_ok=True)
+    with open(os.path.join(ledger.directory, ".archiver.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert AuditArchiver(ledger, retention_days=30).run_once() is None
+    assert _hot_ids() == ids
+    assert AuditArchiver(ledger, retention_days=30).run_once()["archived_rows"] == 2
+
+
+def test_index_entry_layout_is_fixed_width(tmp_path):
+    write_segment(str(tmp_path), _rows([10, 11, 13]))
+    size = os.path.getsize(tmp_path / "seg-000000000010-000000000013.idx")
+    header = struct.calcsize("<8sQQQ32s")
+    assert (size - header) % 4 == 0 and (size - header) // 4 == struct.calcsize("<QIi")
+
+
+def test_key_version_counts_come_from_the_index(tmp_path):
+    archive = AuditArchive(str(tmp_path))
+    archive.append(_rows([1, 2, 4], key_version=1))
+    archive.append(_rows([5], key_version=2) + [(7, OLD, "ldg_rules_updated", "token-7", None)])
+    assert archive.key_version_counts() == {1: 3, 2: 1, None: 1}
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+from core.executors import CRYPTO_EXECUTOR, NER_EXECUTOR, LazyExecutor, run_in, shutdown_executors
+
+
+def _thread_name():
+    return threading.current_thread().name
+
+
+def test_run_in_uses_the_named_pool():
+    assert asyncio.run(run_in(NER_EXECUTOR, _thread_name)).startswith("ldg-ner")
+    assert asyncio.run(run_in(CRYPTO_EXECUTOR, _thread_name)).startswith("atv-crypto")
+
+
+def test_pools_are_recreated_after_shutdown():
+    # A second app lifespan in the same process must still be able to schedule work.
+    for _ in range(2):
+        assert asyncio.run(run_in(NER_EXECUTOR, sum, [1, 2, 3])) == 6
+        shutdown_executors()
+    assert asyncio.run(run_in(CRYPTO_EXECUTOR, max, 1, 2)) == 2
+
+
+def test_pool_is_created_lazily():
+    executor = LazyExecutor(1, "lazy-test")
+    assert executor._pool is None
+    first = executor.get()
+    assert executor.get() is first
+    executor.shutdown()
+    assert executor.get() is not first
+    executor.shutdown()
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from core import acl  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+from services import intent_service  # noqa: E402
+from services.intent_service import IntentService, model_for  # noqa: E402
+
+
+@pytest.fixture
+def mock_llm(monkeypatch, tmp_path):
+    monkeypatch.setattr(acl, "DB_PATH", str(tmp_path / "acl.db"))
+    acl.init_db()
+    server = start_mock_server(port=0, latency="constant:400")
+    monkeypatch.setattr(intent_service.settings, "LLM_BACKEND", "mock")
+    monkeypatch.setattr(intent_service.settings, "MOCK_LLM_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    model_for.cache_clear()
+    yield server
+    model_for.cache_clear()
+    server.shutdown()
+
+
+def _parse_concurrently(count, roles, user_sub=None):
+    async def scenario():
+        service = IntentService()
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(*(
+                service.get_intent_from_prompt("Transfer $100 to my savings account", roles, user_sub)
+                for _ in range(count)
+            ))
+        finally:
+            await acl.close_async_db()
+        return results, time.perf_counter() - started
+
+    return asyncio.run(scenario())
+
+
+def test_llm_calls_do_not_block_the_event_loop(mock_llm):
+    results, elapsed = _parse_concurrently(5, ["teller"])
+    assert all(r.action == "transfer" for r in results)
+    # Five 400 ms calls would take 2 s if each one blocked the loop.
+    assert elapsed < 1.2
+
+
+def test_token_usage_is_recorded_in_the_ledger(mock_llm):
+    _parse_concurrently(3, ["teller", "customer_service"], "teller1")
+    _parse_concurrently(1, ["manager"], "manager1")
+
+    usage = acl.get_llm_usage()
+    assert usage["totals"]["requests"] == 4
+    assert usage["totals"]["input_tokens"] > 0
+    by_roles = {tuple(entry["roles"]): entry for entry in usage["by_role_set"]}
+    assert by_roles[("customer_service", "teller")]["requests"] == 3
+    assert by_roles[("manager",)]["requests"] == 1
+
+    # Every call is also an audit event, searchable by user.
+    events = acl.find_events({"user_sub": "teller1"}, event_type=acl.LLM_USAGE_EVENT)
+    assert len(events) == 3
+    assert events[0]["payload"]["input_tokens"] > 0
+
+    # The aggregates can be recomputed from the ledger.
+    conn = sqlite3.connect(acl.DB_PATH)
+    conn.execute("DELETE FROM llm_usage")
+    conn.commit()
+    conn.close()
+    acl.rebuild_audit_stats()
+    assert acl.get_llm_usage()["totals"] == usage["totals"]
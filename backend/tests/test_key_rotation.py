@@ -0,0 +1,160 @@
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from cryptography.fernet import Fernet
+
+from core import acl
+from core.audit_archive import AuditArchive
+from core.key_rotation import ReencryptionJob, _init_progress_table
+
+OLD_VERSION = 99
+MISSING_VERSION = 98
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def old_key(tmp_path, monkeypatch):
+    """Temporary acl.db plus a retired key (version 99) in the keyring."""
+    monkeypatch.setattr(acl, "DB_PATH", str(tmp_path / "acl.db"))
+    acl.init_db()
+    key = Fernet(Fernet.generate_key())
+    monkeypatch.setitem(acl.KEYRING, OLD_VERSION, key)
+    return key
+
+
+def _insert_old_rows(key, count, key_version=OLD_VERSION):
+    conn = sqlite3.connect(acl.DB_PATH)
+    ids = []
+    for i in range(count):
+        payload = key.encrypt(json.dumps({"n": i}).encode()).decode()
+        ids.append(conn.execute(
+            "INSERT INTO audit (timestamp, event_type, payload, key_version) VALUES (?, ?, ?, ?)",
+            ("2024-01-01T00:00:00Z", "query_success", payload, key_version),
+        ).lastrowid)
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def _versions():
+    conn = sqlite3.connect(acl.DB_PATH)
+    try:
+        return dict(conn.execute("SELECT id, key_version FROM audit"))
+    finally:
+        conn.close()
+
+
+def test_reencrypts_old_rows_and_keeps_them_readable(old_key):
+    ids = _insert_old_rows(old_key, 5)
+    new_id = acl.log_event("query_success", {"n": "new"})
+    job = ReencryptionJob(batch_size=2, rows_per_second=0)
+    assert job.status()["rows_remaining"] == 5
+
+    status = job.run()
+    assert status["rows_done"] == 5
+    assert status["rows_remaining"] == 0
+    assert status["finished_at"] is not None
+    assert set(_versions().values()) == {acl.PRIMARY_KEY_VERSION}
+    for i, event_id in enumerate(ids):
+        assert acl.get_event(event_id)["payload"] == {"n": i}
+    assert acl.get_event(new_id)["payload"] == {"n": "new"}
+
+
+def test_resumes_from_checkpoint(old_key):
+    ids = _insert_old_rows(old_key, 5)
+    job = ReencryptionJob(batch_size=2, rows_per_second=0)
+    conn = sqlite3.connect(acl.DB_PATH)
+    try:
+        _init_progress_table(conn)
+        assert job.run_batch(conn) == 2
+    finally:
+        conn.close()
+    status = job.status()
+    assert (status["last_id"], status["rows_done"], status["rows_remaining"]) == (ids[1], 2, 3)
+
+    # A new job (e.g. after a restart) continues after the checkpoint.
+    resumed = ReencryptionJob(batch_size=2, rows_per_second=0).run()
+    assert resumed["rows_done"] == 5
+    assert resumed["rows_remaining"] == 0
+
+
+def test_undecryptable_rows_are_skipped_and_not_remaining(old_key):
+    good = _insert_old_rows(old_key, 2)
+    lost = _insert_old_rows(Fernet(Fernet.generate_key()), 2, key_version=MISSING_VERSION)
+    bad_token = _insert_old_rows(Fernet(Fernet.generate_key()), 1)  # right version, wrong key
+    job = ReencryptionJob(batch_size=2, rows_per_second=0)
+
+    status = job.run()
+    assert status["error"] is None
+    assert status["rows_done"] == 2
+    assert status["rows_skipped"] == 3
+    assert status["skipped_ids"] == lost + bad_token
+    assert status["rows_remaining"] == 0
+    versions = _versions()
+    assert all(versions[i] == acl.PRIMARY_KEY_VERSION for i in good)
+    assert all(versions[i] == MISSING_VERSION for i in lost)
+
+
+def _index_key(env):
+    env = {**os.environ, **env}
+    out = subprocess.run(
+        [sys.executable, "-c", "from core import acl; print(acl._index_key.hex())"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return out.stdout.strip().splitlines()[-1]
+
+
+def test_index_key_survives_rotation_and_can_be_pinned(monkeypatch):
+    monkeypatch.delenv("AUDIT_INDEX_KEY", raising=False)
+    monkeypatch.delenv("DB_ENCRYPTION_PREVIOUS_KEYS", raising=False)
+    first, second = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    expected = hmac.new(first.encode(), b"audit-blind-index", hashlib.sha256).hexdigest()
+
+    before = _index_key({"DB_ENCRYPTION_KEY": first, "DB_ENCRYPTION_KEY_VERSION": "1"})
+    after = _index_key({"DB_ENCRYPTION_KEY": second, "DB_ENCRYPTION_KEY_VERSION": "2",
+                        "DB_ENCRYPTION_PREVIOUS_KEYS": f"1:{first}"})
+    pinned = _index_key({"DB_ENCRYPTION_KEY": second, "DB_ENCRYPTION_KEY_VERSION": "2",
+                         "AUDIT_INDEX_KEY": "hex:" + expected})
+    assert before == after == pinned == expected
+
+
+def test_old_key_is_retirable_only_when_no_archive_segment_uses_it(old_key, tmp_path):
+    archive = AuditArchive(str(tmp_path / "archive"))
+    _insert_old_rows(old_key, 3)
+    job = ReencryptionJob(batch_size=10, rows_per_second=0, archive=archive)
+    assert job.status()["retirable_key_versions"] == []
+
+    # Two old-key rows reach the archive before re-encryption runs; it only rewrites the hot one.
+    archive.append([(i, "2024-01-01T00:00:00Z", "query_success", "token", OLD_VERSION) for i in (1, 2)])
+    conn = sqlite3.connect(acl.DB_PATH)
+    conn.execute("DELETE FROM audit WHERE id <= 2")
+    conn.commit()
+    conn.close()
+    status = job.run()
+    assert status["rows_remaining"] == 0
+    assert status["archived_old_key_rows"] == 2
+    assert status["archived_key_versions"] == {str(OLD_VERSION): 2}
+    assert OLD_VERSION not in status["retirable_key_versions"]
+
+
+def test_old_key_is_retirable_once_both_tiers_are_clear(old_key, tmp_path):
+    archive = AuditArchive(str(tmp_path / "archive"))
+    _insert_old_rows(old_key, 2)
+    archive.append([(50, "2024-01-01T00:00:00Z", "query_success", "token", acl.PRIMARY_KEY_VERSION)])
+    status = ReencryptionJob(batch_size=10, rows_per_second=0, archive=archive).run()
+    assert status["archived_old_key_rows"] == 0
+    assert OLD_VERSION in status["retirable_key_versions"]
+
+
+def test_rows_without_key_version_pin_every_key(old_key, tmp_path):
+    archive = AuditArchive(str(tmp_path / "archive"))
+    archive.append([(50, "2024-01-01T00:00:00Z", "query_success", "token", None)])
+    status = ReencryptionJob(archive=archive).status()
+    assert status["archived_key_versions"] == {"unknown": 1}
+    assert status["retirable_key_versions"] == []
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from core.ldg_rules import LDGRuleStore
+from core.regex_guard import UnsafePatternError
+
+
+def _rules(*output_patterns):
+    return {"input_patterns": ["password"], "prompt_injection_patterns": [], "output_patterns": list(output_patterns)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "blocked_keywords.json"
+    path.write_text(json.dumps({"version": 1, **_rules("secret")}))
+    rule_store = LDGRuleStore(str(path))
+    rule_store.load()
+    return rule_store
+
+
+def _file(store):
+    with open(store.path) as f:
+        return json.load(f)
+
+
+def _output_patterns(rule_set):
+    return [p.pattern for p in rule_set.output_patterns]
+
+
+def test_load_uses_declared_version(store):
+    assert store.current().version == 1
+    assert store.current().source == "file"
+    assert _output_patterns(store.current()) == ["secret"]
+
+
+def test_publish_activates_and_persists_a_new_version(store):
+    rule_set = store.publish(_rules("api[_-]?key"))
+    assert rule_set.version == 2
+    assert store.current() is rule_set
+    assert _output_patterns(rule_set) == ["api[_-]?key"]
+    assert _file(store)["version"] == 2
+    assert _file(store)["output_patterns"] == ["api[_-]?key"]
+    assert [r["version"] for r in store.history()] == [1, 2]
+    # The file now matches the active rules, so the watcher has nothing to reload.
+    assert store.reload_if_changed() is None
+
+
+def test_publish_rejects_unsafe_patterns_and_keeps_active_rules(store):
+    with pytest.raises(UnsafePatternError):
+        store.publish(_rules("(a+)+$"))
+    assert store.current().version == 1
+    assert _file(store)["version"] == 1
+
+
+def test_default_rollback_steps_back_one_version_at_a_time(store):
+    store.publish(_rules("v2"))
+    store.publish(_rules("v3"))
+
+    assert store.rollback().version == 2
+    assert _file(store)["version"] == 2
+    assert _file(store)["output_patterns"] == ["v2"]
+    assert store.rollback().version == 1
+    assert _output_patterns(store.current()) == ["secret"]
+    with pytest.raises(ValueError):
+        store.rollback()
+    assert store.current().version == 1
+    assert store.reload_if_changed() is None
+
+
+def test_rollback_to_explicit_version(store):
+    store.publish(_rules("v2"))
+    store.publish(_rules("v3"))
+
+    assert store.rollback(1).version == 1
+    # Rolling forward to a version still in the history is allowed explicitly.
+    assert store.rollback(3).version == 3
+    assert _output_patterns(store.current()) == ["v3"]
+    with pytest.raises(ValueError):
+        store.rollback(42)
+    assert store.current().version == 3
+
+
+def test_publish_after_rollback_gets_a_fresh_version(store):
+    store.publish(_rules("v2"))
+    store.rollback()
+    assert store.publish(_rules("v3")).version == 3
+
+
+def test_reload_if_changed_picks_up_edited_file(store, tmp_path):
+    assert store.reload_if_changed() is None
+
+    with open(store.path, "w") as f:
+        json.dump(_rules("edited"), f)
+    rule_set = store.reload_if_changed()
+    assert rule_set is not None and rule_set.version == 2
+    assert store.current() is rule_set
+    assert _output_patterns(rule_set) == ["edited"]
+    assert store.reload_if_changed() is None
+
+
+def test_reload_if_changed_keeps_rules_on_bad_file(store):
+    with open(store.path, "w") as f:
+        f.write("{not json")
+    assert store.reload_if_changed() is None
+
+    with open(store.path, "w") as f:
+        json.dump(_rules("(a+)+$"), f)
+    assert store.reload_if_changed() is None
+    assert store.current().version == 1
+    assert _output_patterns(store.current()) == ["secret"]
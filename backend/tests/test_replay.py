@@ -0,0 +1,85 @@
+import time
+import uuid
+
+import pytest
+
+from core import replay
+from core.replay import ExpiringReplayStore, ReplayStoreFull, SQLiteReplayStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return ExpiringReplayStore(bucket_seconds=1, max_ttl=300, max_entries=1000)
+    return SQLiteReplayStore(str(tmp_path / "replay.db"), max_entries=1000, purge_interval=0)
+
+
+def test_first_use_is_accepted_and_replay_rejected(store):
+    jti = uuid.uuid4().hex
+    exp = time.time() + 60
+    assert store.check_and_record(jti, exp) is True
+    assert store.check_and_record(jti, exp) is False
+    assert store.check_and_record(uuid.uuid4().hex, exp) is True
+
+
+def test_non_hex_jtis_are_supported(store):
+    exp = time.time() + 60
+    assert store.check_and_record("not-a-uuid", exp) is True
+    assert store.check_and_record("not-a-uuid", exp) is False
+
+
+def test_entries_expire_with_their_token(store, monkeypatch):
+    now = time.time()
+    jti = uuid.uuid4().hex
+    assert store.check_and_record(jti, now + 5)
+    # Past the token's expiry (and its wheel slot), the jti is forgotten.
+    monkeypatch.setattr(replay.time, "time", lambda: now + 10)
+    assert store.check_and_record(jti, now + 70) is True
+
+
+def test_full_store_raises(tmp_path):
+    stores = [
+        ExpiringReplayStore(bucket_seconds=1, max_ttl=300, max_entries=3),
+        SQLiteReplayStore(str(tmp_path / "full.db"), max_entries=3, purge_interval=3600),
+    ]
+    for store in stores:
+        exp = time.time() + 60
+        for _ in range(3):
+            assert store.check_and_record(uuid.uuid4().hex, exp)
+        with pytest.raises(ReplayStoreFull):
+            store.check_and_record(uuid.uuid4().hex, exp)
+
+
+def test_memory_store_rejects_lifetimes_beyond_the_wheel():
+    store = ExpiringReplayStore(bucket_seconds=1, max_ttl=10, max_entries=10)
+    with pytest.raises(ValueError):
+        store.check_and_record(uuid.uuid4().hex, time.time() + 60)
+
+
+def test_memory_store_drops_expired_slots_in_bulk(monkeypatch):
+    store = ExpiringReplayStore(bucket_seconds=1, max_ttl=30, max_entries=100)
+    now = time.time()
+    for _ in range(20):
+        store.check_and_record(uuid.uuid4().hex, now + 2)
+    assert len(store) == 20
+    monkeypatch.setattr(replay.time, "time", lambda: now + 5)
+    store.check_and_record(uuid.uuid4().hex, now + 20)
+    assert len(store) == 1
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, second = SQLiteReplayStore(path), SQLiteReplayStore(path)
+    jti = uuid.uuid4().hex
+    assert first.check_and_record(jti, time.time() + 60)
+    assert second.check_and_record(jti, time.time() + 60) is False
+
+
+def test_blocking_flags():
+    assert ExpiringReplayStore.blocking is False
+    assert SQLiteReplayStore.blocking is True
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        replay.create_replay_store("redis")
@@ -0,0 +1,76 @@
+import unicodedata
+
+import pytest
+
+from core.ldg import IncrementalOutputGuard, ldg_output_check
+from core.ldg_rules import LDGRuleSet
+from core.text_analysis import StreamNormalizer, normalize_text
+
+TEXTS = [
+    "café au lait",
+    unicodedata.normalize("NFD", "café au lait"),
+    "Ｆｕｌｌ ｗｉｄｔｈ ℌello   world",
+    unicodedata.normalize("NFD", "한글 각"),
+    "a​́b",
+    "ȩ́ and ﬁ ㎏",
+    "x" + "́" * 40 + "y",
+]
+
+
+def _stream(text, size):
+    normalizer = StreamNormalizer()
+    out, offsets = "", []
+    for i in range(0, len(text), size):
+        norm, chunk_offsets = normalizer.feed(text[i:i + size])
+        out += norm
+        offsets += chunk_offsets
+    norm, chunk_offsets = normalizer.flush()
+    return out + norm, offsets + chunk_offsets
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 1000])
+def test_stream_matches_whole_string_normalization(text, size):
+    out, offsets = _stream(text, size)
+    assert out == normalize_text(text)
+    assert len(offsets) == len(out)
+    assert offsets == sorted(offsets)
+
+
+def test_combining_mark_is_held_until_the_next_character():
+    normalizer = StreamNormalizer()
+    assert normalizer.feed("cafe") == ("caf", [0, 1, 2])
+    assert normalizer.feed("́!") == ("é", [3])
+    assert normalizer.consumed == 5
+    assert normalizer.flush() == ("!", [5])
+
+
+def _run_guard(guard, chunks):
+    emitted = ""
+    for chunk in chunks:
+        result = guard.feed(chunk)
+        if result["status"] != "ok":
+            return result, emitted
+        emitted += result["emit"]
+    result = guard.finish()
+    return result, emitted + result.get("emit", "")
+
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+def test_stream_guard_blocks_decomposed_term_like_output_check(size):
+    rules = LDGRuleSet(1, {"output_patterns": ["café secret"]}, "test")
+    text = "the " + unicodedata.normalize("NFD", "café secret") + " is out"
+    assert ldg_output_check(text, rules)["status"] == "blocked"
+
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    result, emitted = _run_guard(IncrementalOutputGuard(rules), chunks)
+    assert result["status"] == "blocked"
+    assert "secret" not in emitted
+
+
+def test_stream_guard_releases_everything_when_clean():
+    rules = LDGRuleSet(1, {"output_patterns": ["café secret"]}, "test")
+    text = unicodedata.normalize("NFD", "café au lait, é")
+    result, emitted = _run_guard(IncrementalOutputGuard(rules), list(text))
+    assert result["status"] == "ok"
+    assert emitted == text